@@ -0,0 +1,150 @@
+import json
+import math
+import os
+
+from ServoCore import PoseSequence
+
+ARM_CONFIG_PATH = os.path.join("media", "arm.json")
+
+
+class UnreachableError(ValueError):
+    pass
+
+
+class ArmModel:
+    """
+    Кинематическая модель четырёхсервоприводной руки.
+
+    Колонна поворачивает руку вокруг вертикальной оси, левое плечо задаёт
+    угол нижнего звена к горизонту, правое плечо — угол верхнего звена:
+    при параллелограммной тяге (parallel_linkage) он отсчитывается от
+    горизонта, иначе — от нижнего звена. Захват на положение не влияет.
+    Угол сервопривода связан с углом сочленения как offset + direction * угол.
+    Длины задаются в миллиметрах, начало координат — на оси колонны у основания.
+
+    Прямая и обратная задачи решаются в замкнутом виде, без итераций и
+    таблиц: одно решение занимает единицы микросекунд.
+    """
+
+    FIELDS = ("base_height", "upper_arm", "forearm", "tool_length", "offsets", "directions", "parallel_linkage")
+
+    def __init__(self, base_height=55.0, upper_arm=80.0, forearm=80.0, tool_length=68.0,
+                 offsets=(90, 0, 90), directions=(1, 1, 1), parallel_linkage=True):
+        self.base_height = base_height
+        self.upper_arm = upper_arm
+        self.forearm = forearm
+        self.tool_length = tool_length
+        self.offsets = tuple(offsets)
+        self.directions = tuple(directions)
+        self.parallel_linkage = parallel_linkage
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{field: data[field] for field in cls.FIELDS if field in data})
+
+    @classmethod
+    def load(cls, path=ARM_CONFIG_PATH):
+        """
+        Читает модель из JSON; если файла нет, возвращает модель по умолчанию.
+        """
+        if not os.path.exists(path):
+            return cls()
+        with open(path, "r") as f:
+            return cls.from_dict(json.load(f))
+
+    def save(self, path=ARM_CONFIG_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def joint_angles(self, angles):
+        """
+        :param angles: Углы сервоприводов (первые три).
+        :return: Поворот колонны, угол нижнего и верхнего звена к горизонту в радианах.
+        """
+        yaw, shoulder, elbow = ((angle - offset) / direction
+                                for angle, offset, direction in zip(angles, self.offsets, self.directions))
+        forearm = elbow if self.parallel_linkage else shoulder + elbow
+        return math.radians(yaw), math.radians(shoulder), math.radians(forearm)
+
+    def servo_angles(self, yaw, shoulder, forearm):
+        elbow = forearm if self.parallel_linkage else forearm - shoulder
+        return tuple(offset + direction * math.degrees(joint)
+                     for joint, offset, direction in zip((yaw, shoulder, elbow), self.offsets, self.directions))
+
+    def forward(self, angles):
+        """
+        Прямая задача.
+
+        :param angles: Углы сервоприводов колонны и плеч, градусы.
+        :return: Координаты (x, y, z) конца захвата, мм.
+        """
+        yaw, shoulder, forearm = self.joint_angles(angles)
+        reach = self.upper_arm * math.cos(shoulder) + self.forearm * math.cos(forearm) + self.tool_length
+        height = self.base_height + self.upper_arm * math.sin(shoulder) + self.forearm * math.sin(forearm)
+        return reach * math.cos(yaw), reach * math.sin(yaw), height
+
+    def inverse(self, x, y, z):
+        """
+        Обратная задача (конфигурация «локоть вверх»).
+
+        :return: Углы сервоприводов колонны и плеч, градусы (вещественные).
+        :raises UnreachableError: Если точка вне досягаемости или вне диапазона 0–180°.
+        """
+        yaw = math.atan2(y, x)
+        reach = math.hypot(x, y) - self.tool_length
+        height = z - self.base_height
+        distance = math.hypot(reach, height)
+        if distance > self.upper_arm + self.forearm or distance < abs(self.upper_arm - self.forearm) or not distance:
+            raise UnreachableError(f"Точка ({x:.0f}, {y:.0f}, {z:.0f}) вне досягаемости руки")
+        cos_spread = (self.upper_arm ** 2 + distance ** 2 - self.forearm ** 2) / (2 * self.upper_arm * distance)
+        shoulder = math.atan2(height, reach) + math.acos(max(-1.0, min(1.0, cos_spread)))
+        forearm = math.atan2(height - self.upper_arm * math.sin(shoulder), reach - self.upper_arm * math.cos(shoulder))
+        angles = self.servo_angles(yaw, shoulder, forearm)
+        if not all(-0.5 <= angle <= 180.5 for angle in angles):
+            raise UnreachableError(f"Для точки ({x:.0f}, {y:.0f}, {z:.0f}) нужны углы вне диапазона 0–180°")
+        return angles
+
+    def inverse_many(self, points):
+        """
+        Обратная задача для набора точек.
+
+        :return: Список углов в том же порядке.
+        :raises UnreachableError: Если недостижима хотя бы одна точка.
+        """
+        inverse = self.inverse
+        return [inverse(x, y, z) for x, y, z in points]
+
+    def line_sequence(self, angles, target, linear_speed, rate, gripper=None):
+        """
+        Прямолинейное перемещение конца захвата в декартовых координатах.
+
+        Отрезок от текущего положения до target делится на шаги по 1 / rate
+        секунды, в каждой точке решается обратная задача. Уставки идут со
+        скоростью 0, то есть применяются платой (и планировщиком плавного
+        движения) сразу, а темп движения задают задержки между позами.
+
+        :param angles: Текущие углы всех сервоприводов.
+        :param target: Целевая точка (x, y, z), мм.
+        :param linear_speed: Линейная скорость, мм/с.
+        :param rate: Частота уставок, Гц.
+        :param gripper: Угол захвата (по умолчанию текущий).
+        :return: PoseSequence с уставками.
+        :raises UnreachableError: Если отрезок выходит из рабочей зоны.
+        """
+        self.inverse(*target)
+        start = self.forward(angles)
+        length = math.sqrt(sum((b - a) ** 2 for a, b in zip(start, target)))
+        steps = max(1, math.ceil(length / linear_speed * rate))
+        points = [tuple(a + (b - a) * step / steps for a, b in zip(start, target)) for step in range(1, steps + 1)]
+        extra = list(angles[3:])
+        if gripper is not None and extra:
+            extra[0] = gripper
+        sequence = PoseSequence(len(angles))
+        delay = round(1000 / rate)
+        for joint_angles in self.inverse_many(points):
+            sequence.append([round(angle) for angle in joint_angles] + extra, [0] * len(angles), delay)
+        return sequence
@@ -1,88 +1,216 @@
-import os
 import json
-import time
-import subprocess
-import platform
+import os
+
 from PyQt5 import QtWidgets, QtGui
-from PyQt5.QtCore import Qt, QTimer
-
-import serial.tools.list_ports
-
-
-arduino_code = """\
-#include <Servo.h>
-
-Servo column;
-Servo left_shoulder;
-Servo right_shoulder;
-Servo grip;
-
-void setup() {
-  Serial.begin(9600);
-  column.attach(4);
-  left_shoulder.attach(5);
-  right_shoulder.attach(6);
-  grip.attach(7);
-}
-
-void loop() {
-  if (Serial.available() > 0) {
-    String input = Serial.readStringUntil('\\n');
-    int commaIndex = input.indexOf(',');
-    if (commaIndex > 0) {
-      int servoNum = input.substring(0, commaIndex).toInt();
-      int angle = input.substring(commaIndex + 1).toInt();
-
-      switch (servoNum) {
-        case 1:
-          column.write(angle);
-          break;
-        case 2:
-          left_shoulder.write(angle);
-          break;
-        case 3:
-          right_shoulder.write(angle);
-          break;
-        case 4:
-          grip.write(angle);
-          break;
-      }
-    }
-  }
-}
-"""
+from PyQt5.QtCore import (Qt, QAbstractListModel, QItemSelection, QItemSelectionModel, QModelIndex,
+                          QSettings, QTimer, pyqtSignal)
+import serial
+
+from ArmKinematics import ArmModel, UnreachableError, ARM_CONFIG_PATH
+from ServoCore import (PROTOCOL_TEXT, PROTOCOL_BINARY, BAUD_RATES, DEFAULT_BAUDRATE, COMMANDS_DIR, SIMULATOR_URL,
+                       DEFAULT_RECORD_RATE, DEFAULT_RECORD_TOLERANCE, build_firmware, BoardIdentifier,
+                       PortWatcher, PoseSequence, SequenceFile, MotionRecorder, FirmwareBuilder,
+                       ServoController, DeviceProfile, DEFAULT_PROFILE)
+
+
+def row_ranges(rows):
+    """
+    Группирует номера строк в непрерывные диапазоны [start, stop).
+    """
+    ranges = []
+    for row in sorted(set(rows)):
+        if ranges and ranges[-1][1] == row:
+            ranges[-1][1] = row + 1
+        else:
+            ranges.append([row, row + 1])
+    return ranges
+
+
+class PoseListModel(QAbstractListModel):
+    """
+    Модель списка команд поверх PoseSequence.
+
+    Текст строки формируется только когда представление запрашивает видимую
+    строку. Изменения сообщаются представлению точечными уведомлениями о
+    вставке, удалении и перемещении строк, без перестроения всего списка.
+    """
+
+    def __init__(self, sequence, parent=None):
+        super().__init__(parent)
+        self.sequence = sequence
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.sequence)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and index.isValid():
+            return ServoControllerApp.format_pose(index.row(), self.sequence[index.row()])
+        return None
+
+    def set_sequence(self, sequence):
+        self.beginResetModel()
+        self.sequence = sequence
+        self.endResetModel()
+
+    def refresh(self):
+        if len(self.sequence):
+            self.dataChanged.emit(self.index(0), self.index(len(self.sequence) - 1))
+
+    def append_pose(self, angles, speeds, delay=None):
+        row = len(self.sequence)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.sequence.append(angles, speeds, delay)
+        self.endInsertRows()
+
+    def set_delays(self, rows, delay):
+        for row in rows:
+            self.sequence.delays[row] = PoseSequence.NO_DELAY if delay is None else delay
+        for start, stop in row_ranges(rows):
+            self.dataChanged.emit(self.index(start), self.index(stop - 1))
+
+    def append_sequence(self, sequence):
+        row = len(self.sequence)
+        self.beginInsertRows(QModelIndex(), row, row + len(sequence) - 1)
+        self.sequence.insert_sequence(row, sequence)
+        self.endInsertRows()
+
+    def remove_rows(self, rows):
+        for start, stop in reversed(row_ranges(rows)):
+            self.beginRemoveRows(QModelIndex(), start, stop - 1)
+            self.sequence.delete_range(start, stop)
+            self.endRemoveRows()
+        self.renumber()
+
+    def duplicate_rows(self, rows):
+        """
+        Вставляет копии строк сразу после последней из них.
+
+        :return: Диапазон вставленных строк.
+        """
+        ranges = row_ranges(rows)
+        copies = PoseSequence(self.sequence.servo_count)
+        for start, stop in ranges:
+            copies.insert_sequence(len(copies), self.sequence.slice(start, stop))
+        row = ranges[-1][1]
+        self.beginInsertRows(QModelIndex(), row, row + len(copies) - 1)
+        self.sequence.insert_sequence(row, copies)
+        self.endInsertRows()
+        self.renumber()
+        return row, row + len(copies)
+
+    def move_range(self, start, stop, delta):
+        """
+        Сдвигает непрерывный диапазон строк на delta позиций.
+
+        :return: Новое начало диапазона или None, если сдвиг невозможен.
+        """
+        target = start + delta
+        if delta == 0 or target < 0 or stop + delta > len(self.sequence):
+            return None
+        destination = target if delta < 0 else stop + delta
+        if not self.beginMoveRows(QModelIndex(), start, stop - 1, QModelIndex(), destination):
+            return None
+        moved = self.sequence.slice(start, stop)
+        self.sequence.delete_range(start, stop)
+        self.sequence.insert_sequence(target, moved)
+        self.endMoveRows()
+        self.renumber()
+        return target
+
+    def renumber(self):
+        # Номера команд входят в текст строки; перерисуются только видимые строки
+        self.refresh()
+
 
 class ServoControllerApp(QtWidgets.QWidget):
+    serial_error = pyqtSignal(str)
+    playback_step = pyqtSignal(int)
+    playback_finished = pyqtSignal()
+    baudrate_negotiated = pyqtSignal(str, int)
+    build_progress = pyqtSignal(str, int)
+    board_status = pyqtSignal(str, str)
+    ports_changed = pyqtSignal(object, object, object)
+    build_finished = pyqtSignal(bool, str)
+
     def __init__(self):
         super().__init__()
         self.command_listbox = None
+        self.command_model = None
+        self.record_action = None
         self.delay_entry = None
+        self.loop_checkbox = None
+        self.pause_button = None
         self.speed_label = None
         self.angel_label = None
         self.angle_sliders = None
         self.speed_sliders = None
+        self.channels_area = None
+        self.profile_menu = None
+        self.cartesian_group = None
         self.connection_label = None
         self.port_combobox = None
+        self.protocol_combobox = None
+        self.baud_combobox = None
+        self.negotiate_checkbox = None
+        self.ack_checkbox = None
         self.message_label = None
-        self.available_ports = None
-        self.ser = None
-        self.target_angles = [90, 90, 90, 90]
-        self.target_speeds = [50, 50, 50, 50]
-        self.command_list = []
-        self.command_queue = []
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.process_command_queue)
-        self.timer.start(1)  # Периодический таймер с интервалом в 100 м
+        self.available_ports = []
+        self.port_infos = {}
+        self.board_identifier = BoardIdentifier()
+        # Устройства (VID, PID, серийный номер), отключившиеся во время работы
+        self.lost_boards = set()
+        self.auto_reconnect_action = None
+        # Профиль устройства: число каналов, их имена, пределы и плата.
+        # Выбранный профиль запоминается между запусками
+        self.settings = QSettings("RoboCore", "ControllerManager")
+        self.profile = self.load_profile(self.settings.value("profile", DEFAULT_PROFILE.name))
+        self.target_angles = self.profile.homes
+        self.target_speeds = [50] * self.profile.servo_count
+        self.command_list = PoseSequence(self.profile.servo_count)
+        # Файл текущей последовательности и число уже сохранённых в нём команд
+        # (None — список менялся не только добавлением, нужна полная перезапись)
+        self.sequence_file = None
+        self.saved_count = 0
+        # Запись движения: выборки снимаются таймером с частотой record_rate
+        self.recorder = MotionRecorder(len(self.target_angles))
+        self.record_rate = DEFAULT_RECORD_RATE
+        self.record_tolerance = DEFAULT_RECORD_TOLERANCE
+        self.record_timer = QTimer(self)
+        self.record_timer.setTimerType(Qt.PreciseTimer)
+        self.record_timer.timeout.connect(self.record_sample)
+        self.arm = ArmModel.load()
+        self.cartesian_spins = []
+        self.linear_speed_spin = None
+        # Порты, очереди команд и воспроизведение живут в ядре ServoCore;
+        # окно только передаёт ему действия пользователя
+        self.controller = ServoController(len(self.target_angles), on_error=self.serial_error.emit,
+                                          on_baudrate=self.baudrate_negotiated.emit)
+        self.telemetry_label = None
+        self.serial_error.connect(self.show_serial_error)
+        self.baudrate_negotiated.connect(self.show_baudrate)
+        self.builder = None
+        self.build_dialog = None
+        self.build_stage = ""
+        self.board_statuses = {}
+        self.build_progress.connect(self.show_build_progress)
+        self.board_status.connect(self.show_board_status)
+        self.build_finished.connect(self.finish_build)
+        self.playback_step.connect(self.show_playback_step)
+        self.playback_finished.connect(self.finish_playback)
+        self.ports_changed.connect(self.update_ports)
 
         self.company_info = ""
         self.program_info = "Программа: Менеджер Сервоприводов \nВерсия: 1.0\n© Разработчик: Василенко Евгений, 2024\n Лицензия: MIT License"
 
         self.init_ui()
 
+        self.port_watcher = PortWatcher(self.ports_changed.emit)
+        self.port_watcher.start()
+
     def init_ui(self):
         self.setWindowTitle("Менеджер Сервоприводов")
         self.setWindowIcon(QtGui.QIcon("media/images/logo.svg"))
-        self.setGeometry(100, 100, 910, 700)
+        self.setGeometry(100, 100, 910, 870)
 
         main_layout = QtWidgets.QVBoxLayout()
 
@@ -92,23 +220,14 @@ class ServoControllerApp(QtWidgets.QWidget):
         # Основное содержимое
         layout = QtWidgets.QGridLayout()
 
-        # Сканирование доступных COM-портов
-        self.available_ports = self.get_ports()
-
-        # Выбор порта
+        # Выбор порта; список заполняется фоновым PortWatcher
         port_label = QtWidgets.QLabel("Выберите COM порт:")
         layout.addWidget(port_label, 0, 0)
 
         self.port_combobox = QtWidgets.QComboBox()
-        self.port_combobox.addItems(self.available_ports)
+        self.port_combobox.addItem("Нет доступных портов")
         layout.addWidget(self.port_combobox, 0, 1)
 
-        if self.available_ports:
-            self.port_combobox.setCurrentIndex(0)
-        else:
-            self.port_combobox.addItem("Нет доступных портов")
-            self.port_combobox.setCurrentIndex(0)
-
         connect_button = QtWidgets.QPushButton("Подключиться")
         connect_button.clicked.connect(self.connect_port)
         layout.addWidget(connect_button, 0, 2)
@@ -121,84 +240,40 @@ class ServoControllerApp(QtWidgets.QWidget):
         self.connection_label = QtWidgets.QLabel("Нет соединения")
         layout.addWidget(self.connection_label, 1, 1)
 
-        self.angel_label = QtWidgets.QLabel("Угол поворота")
-        layout.addWidget(self.angel_label, 2, 1)
-
-        self.speed_label = QtWidgets.QLabel("Скорость")
-        layout.addWidget(self.speed_label, 2, 2)
-
-        # Настройки для сервоприводов
-        servo_names = ["Колонна", "Левое плечо", "Правое плечо", "Захват"]
-        self.angle_sliders = []
-        self.speed_sliders = []
-
-        for i in range(4):
-            servo_label = QtWidgets.QLabel(f"{servo_names[i]}")
-            layout.addWidget(servo_label, i + 3, 0)
-
-            # Создание контейнера для ползунка угла и меток
-            angle_slider_layout = QtWidgets.QVBoxLayout()
-
-            # Верхние метки значений для углов
-            top_labels_layout = QtWidgets.QHBoxLayout()
-            top_labels_layout.addWidget(QtWidgets.QLabel("0°"))
-            top_labels_layout.addWidget(QtWidgets.QLabel(""))
-            top_labels_layout.addWidget(QtWidgets.QLabel(""))
-            top_labels_layout.addWidget(QtWidgets.QLabel("60°"))
-            top_labels_layout.addWidget(QtWidgets.QLabel(""))
-            top_labels_layout.addWidget(QtWidgets.QLabel(""))
-            top_labels_layout.addWidget(QtWidgets.QLabel("120°"))
-            top_labels_layout.addWidget(QtWidgets.QLabel(""))
-            top_labels_layout.addWidget(QtWidgets.QLabel(""))
-            top_labels_layout.addWidget(QtWidgets.QLabel("180°"))
-            angle_slider_layout.addLayout(top_labels_layout)
-
-            # Создание ползунка угла
-            angle_slider = QtWidgets.QSlider(Qt.Horizontal)
-            angle_slider.setRange(0, 180)
-            angle_slider.setValue(self.target_angles[i])
-            angle_slider.setTickPosition(QtWidgets.QSlider.TicksBelow)  # Метки под ползунком
-            angle_slider.setTickInterval(60)  # Интервал между метками
-            angle_slider.valueChanged.connect(
-                lambda val, j=i: self.update_servo(j, val, self.speed_sliders[j].value())
-            )
-            angle_slider_layout.addWidget(angle_slider)
-
-            layout.addLayout(angle_slider_layout, i + 3, 1)
-
-            # Создание контейнера для ползунка скорости и меток
-            speed_slider_layout = QtWidgets.QVBoxLayout()
-
-            # Верхние метки значений для скорости
-            speed_top_labels_layout = QtWidgets.QHBoxLayout()
-            speed_top_labels_layout.addWidget(QtWidgets.QLabel("1°/с"))
-            speed_top_labels_layout.addWidget(QtWidgets.QLabel(""))
-            speed_top_labels_layout.addWidget(QtWidgets.QLabel("25°/с"))
-            speed_top_labels_layout.addWidget(QtWidgets.QLabel(""))
-            speed_top_labels_layout.addWidget(QtWidgets.QLabel("50°/с"))
-            speed_top_labels_layout.addWidget(QtWidgets.QLabel(""))
-            speed_top_labels_layout.addWidget(QtWidgets.QLabel("75°/с"))
-            speed_top_labels_layout.addWidget(QtWidgets.QLabel(""))
-            speed_top_labels_layout.addWidget(QtWidgets.QLabel("100°/с"))
-            speed_slider_layout.addLayout(speed_top_labels_layout)
-
-            # Создание ползунка скорости
-            speed_slider = QtWidgets.QSlider(Qt.Horizontal)
-            speed_slider.setRange(1, 100)
-            speed_slider.setValue(self.target_speeds[i])
-            speed_slider.setTickPosition(QtWidgets.QSlider.TicksBelow)  # Метки под ползунком
-            speed_slider.setTickInterval(25)  # Интервал между метками
-            speed_slider.valueChanged.connect(
-                lambda val, j=i: self.update_servo(j, self.angle_sliders[j].value(), val)
-            )
-            speed_slider_layout.addWidget(speed_slider)
-
-            layout.addLayout(speed_slider_layout, i + 3, 2)
-
-            self.angle_sliders.append(angle_slider)
-            self.speed_sliders.append(speed_slider)
+        # Выбор протокола обмена с платой
+        self.protocol_combobox = QtWidgets.QComboBox()
+        self.protocol_combobox.addItem("Текстовый протокол", PROTOCOL_TEXT)
+        self.protocol_combobox.addItem("Бинарный протокол", PROTOCOL_BINARY)
+        self.protocol_combobox.currentIndexChanged.connect(self.change_protocol)
+        layout.addWidget(self.protocol_combobox, 1, 2)
+
+        # Скорость порта: с ней стартует прошивка и открывается соединение
+        self.baud_combobox = QtWidgets.QComboBox()
+        for rate in BAUD_RATES:
+            self.baud_combobox.addItem(f"{rate} бод", rate)
+        # Скорость запоминается между запусками: плата работает на той, с которой её прошили
+        baudrate = self.settings.value("baudrate", DEFAULT_BAUDRATE, type=int)
+        self.baud_combobox.setCurrentIndex(BAUD_RATES.index(baudrate if baudrate in BAUD_RATES else DEFAULT_BAUDRATE))
+        self.baud_combobox.currentIndexChanged.connect(
+            lambda: self.settings.setValue("baudrate", self.baud_combobox.currentData()))
+        layout.addWidget(self.baud_combobox, 1, 3)
+
+        self.negotiate_checkbox = QtWidgets.QCheckBox("Согласовать скорость")
+        layout.addWidget(self.negotiate_checkbox, 2, 3)
+
+        self.ack_checkbox = QtWidgets.QCheckBox("Подтверждение команд")
+        layout.addWidget(self.ack_checkbox, 7, 3)
+
+        # Ползунки каналов строятся по профилю устройства; при большом
+        # числе каналов область прокручивается
+        self.channels_area = QtWidgets.QScrollArea()
+        self.channels_area.setWidgetResizable(True)
+        self.channels_area.setFrameShape(QtWidgets.QFrame.NoFrame)
+        layout.addWidget(self.channels_area, 2, 0, 5, 3)
+        self.create_channel_sliders()
 
         # Поле для ввода задержки
+        # Задержка для шагов без собственной задержки; её можно менять перед воспроизведением
         delay_label = QtWidgets.QLabel("Задержка (мс):")
         layout.addWidget(delay_label, 8, 0)
 
@@ -215,9 +290,26 @@ class ServoControllerApp(QtWidgets.QWidget):
         delete_button.clicked.connect(self.delete_command)
         layout.addWidget(delete_button, 9, 1)
 
-        self.command_listbox = QtWidgets.QListWidget()
+        self.command_model = PoseListModel(self.command_list, self)
+        self.command_listbox = QtWidgets.QListView()
+        self.command_listbox.setModel(self.command_model)
+        self.command_listbox.setUniformItemSizes(True)
+        self.command_listbox.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
         layout.addWidget(self.command_listbox, 10, 0, 1, 2)
 
+        # Групповые операции над выделенными командами
+        move_up_button = QtWidgets.QPushButton("Переместить вверх")
+        move_up_button.clicked.connect(lambda: self.move_commands(-1))
+        layout.addWidget(move_up_button, 7, 0)
+
+        move_down_button = QtWidgets.QPushButton("Переместить вниз")
+        move_down_button.clicked.connect(lambda: self.move_commands(1))
+        layout.addWidget(move_down_button, 7, 1)
+
+        duplicate_button = QtWidgets.QPushButton("Дублировать")
+        duplicate_button.clicked.connect(self.duplicate_commands)
+        layout.addWidget(duplicate_button, 7, 2)
+
         step_play_button = QtWidgets.QPushButton("Пошаговое воспроизведение")
         step_play_button.clicked.connect(self.step_play)
         layout.addWidget(step_play_button, 9, 2)
@@ -226,6 +318,22 @@ class ServoControllerApp(QtWidgets.QWidget):
         auto_play_button.clicked.connect(self.auto_play)
         layout.addWidget(auto_play_button, 9, 3)
 
+        # Управление воспроизведением
+        self.loop_checkbox = QtWidgets.QCheckBox("Повторять")
+        layout.addWidget(self.loop_checkbox, 8, 2)
+
+        smooth_checkbox = QtWidgets.QCheckBox("Плавное движение")
+        smooth_checkbox.toggled.connect(self.set_smooth_motion)
+        layout.addWidget(smooth_checkbox, 8, 3)
+
+        self.pause_button = QtWidgets.QPushButton("Пауза")
+        self.pause_button.clicked.connect(self.toggle_pause)
+        layout.addWidget(self.pause_button, 5, 3)
+
+        stop_button = QtWidgets.QPushButton("Остановить воспроизведение")
+        stop_button.clicked.connect(self.stop_playback)
+        layout.addWidget(stop_button, 6, 3)
+
         # Кнопки для сохранения и загрузки команд
         save_button = QtWidgets.QPushButton("Сохранить команды в файл")
         save_button.clicked.connect(self.save_all_commands)
@@ -244,12 +352,90 @@ class ServoControllerApp(QtWidgets.QWidget):
         layout.addWidget(upload_button, 0, 3)
 
         main_layout.addLayout(layout)
+
+        # Панель телеметрии канала связи
+        self.create_cartesian_panel(main_layout)
+        self.create_telemetry_panel(main_layout)
+
         self.setLayout(main_layout)
 
     def create_menu(self, main_layout):
         # Создание менюбар
         menubar = QtWidgets.QMenuBar(self)
 
+        # Меню Файл
+        file_menu = menubar.addMenu("Файл")
+
+        save_as_action = QtWidgets.QAction("Сохранить команды как...", self)
+        save_as_action.triggered.connect(self.save_commands_as)
+        file_menu.addAction(save_as_action)
+
+        play_file_action = QtWidgets.QAction("Воспроизвести файл...", self)
+        play_file_action.triggered.connect(self.play_file)
+        file_menu.addAction(play_file_action)
+
+        # Меню Правка: преобразования всей последовательности
+        edit_menu = menubar.addMenu("Правка")
+
+        offset_action = QtWidgets.QAction("Сместить углы...", self)
+        offset_action.triggered.connect(self.offset_sequence)
+        edit_menu.addAction(offset_action)
+
+        scale_action = QtWidgets.QAction("Масштабировать углы...", self)
+        scale_action.triggered.connect(self.scale_sequence)
+        edit_menu.addAction(scale_action)
+
+        stretch_action = QtWidgets.QAction("Изменить темп...", self)
+        stretch_action.triggered.connect(self.stretch_sequence)
+        edit_menu.addAction(stretch_action)
+
+        delay_action = QtWidgets.QAction("Задержка выбранных команд...", self)
+        delay_action.triggered.connect(self.edit_delays)
+        edit_menu.addAction(delay_action)
+
+        # Меню записи движения
+        record_menu = menubar.addMenu("Запись")
+
+        self.record_action = QtWidgets.QAction("Записывать движение", self)
+        self.record_action.setCheckable(True)
+        self.record_action.toggled.connect(self.toggle_recording)
+        record_menu.addAction(self.record_action)
+
+        record_rate_action = QtWidgets.QAction("Частота записи...", self)
+        record_rate_action.triggered.connect(self.ask_record_rate)
+        record_menu.addAction(record_rate_action)
+
+        record_tolerance_action = QtWidgets.QAction("Допуск прореживания...", self)
+        record_tolerance_action.triggered.connect(self.ask_record_tolerance)
+        record_menu.addAction(record_tolerance_action)
+
+        # Меню профилей устройств
+        self.profile_menu = menubar.addMenu("Устройство")
+        self.profile_menu.aboutToShow.connect(self.update_profile_menu)
+
+        # Меню кинематической модели руки
+        arm_menu = menubar.addMenu("Рука")
+
+        arm_dimensions_action = QtWidgets.QAction("Размеры звеньев...", self)
+        arm_dimensions_action.triggered.connect(self.ask_arm_dimensions)
+        arm_menu.addAction(arm_dimensions_action)
+
+        # Меню работы с несколькими платами
+        boards_menu = menubar.addMenu("Платы")
+
+        connect_multiple_action = QtWidgets.QAction("Подключить несколько плат...", self)
+        connect_multiple_action.triggered.connect(self.connect_multiple_ports)
+        boards_menu.addAction(connect_multiple_action)
+
+        upload_multiple_action = QtWidgets.QAction("Прошить несколько плат...", self)
+        upload_multiple_action.triggered.connect(self.upload_firmware_multiple)
+        boards_menu.addAction(upload_multiple_action)
+
+        self.auto_reconnect_action = QtWidgets.QAction("Переподключать отключившиеся платы", self)
+        self.auto_reconnect_action.setCheckable(True)
+        self.auto_reconnect_action.setChecked(True)
+        boards_menu.addAction(self.auto_reconnect_action)
+
         # Меню Справка
         help_menu = menubar.addMenu("Справка")
 
@@ -266,111 +452,772 @@ class ServoControllerApp(QtWidgets.QWidget):
         # Добавление менюбар в основной макет
         main_layout.setMenuBar(menubar)
 
+    def create_channel_sliders(self):
+        widget = QtWidgets.QWidget()
+        grid = QtWidgets.QGridLayout()
+        grid.setContentsMargins(0, 0, 0, 0)
+
+        self.angel_label = QtWidgets.QLabel("Угол поворота")
+        grid.addWidget(self.angel_label, 0, 1)
+
+        self.speed_label = QtWidgets.QLabel("Скорость")
+        grid.addWidget(self.speed_label, 0, 2)
+
+        self.angle_sliders = []
+        self.speed_sliders = []
+
+        for i, channel in enumerate(self.profile.channels):
+            grid.addWidget(QtWidgets.QLabel(channel.name), i + 1, 0)
+
+            # Ползунок угла в пределах канала с метками над ним
+            low, high = channel.min_angle, channel.max_angle
+            angle_slider_layout = QtWidgets.QVBoxLayout()
+            angle_slider_layout.addLayout(self.scale_labels(
+                [low + (high - low) * part // 3 for part in range(4)], "°"))
+
+            angle_slider = QtWidgets.QSlider(Qt.Horizontal)
+            angle_slider.setRange(low, high)
+            angle_slider.setValue(self.target_angles[i])
+            angle_slider.setTickPosition(QtWidgets.QSlider.TicksBelow)  # Метки под ползунком
+            angle_slider.setTickInterval(max(1, (high - low) // 3))  # Интервал между метками
+            angle_slider.valueChanged.connect(
+                lambda val, j=i: self.update_servo(j, val, self.speed_sliders[j].value())
+            )
+            angle_slider_layout.addWidget(angle_slider)
+            grid.addLayout(angle_slider_layout, i + 1, 1)
+
+            # Ползунок скорости
+            speed_slider_layout = QtWidgets.QVBoxLayout()
+            speed_slider_layout.addLayout(self.scale_labels([1, 25, 50, 75, 100], "°/с"))
+
+            speed_slider = QtWidgets.QSlider(Qt.Horizontal)
+            speed_slider.setRange(1, 100)
+            speed_slider.setValue(self.target_speeds[i])
+            speed_slider.setTickPosition(QtWidgets.QSlider.TicksBelow)  # Метки под ползунком
+            speed_slider.setTickInterval(25)  # Интервал между метками
+            speed_slider.valueChanged.connect(
+                lambda val, j=i: self.update_servo(j, self.angle_sliders[j].value(), val)
+            )
+            speed_slider_layout.addWidget(speed_slider)
+            grid.addLayout(speed_slider_layout, i + 1, 2)
+
+            self.angle_sliders.append(angle_slider)
+            self.speed_sliders.append(speed_slider)
+
+        widget.setLayout(grid)
+        self.channels_area.setWidget(widget)
+        # Без прокрутки видны четыре канала
+        rows = self.profile.servo_count
+        height = widget.sizeHint().height()
+        self.channels_area.setMinimumHeight(height if rows <= 4 else height * 9 // (2 * rows + 1))
+
+    @staticmethod
+    def scale_labels(values, suffix):
+        labels_layout = QtWidgets.QHBoxLayout()
+        for i, value in enumerate(values):
+            if i:
+                labels_layout.addStretch()
+            labels_layout.addWidget(QtWidgets.QLabel(f"{value}{suffix}"))
+        return labels_layout
+
+    def create_cartesian_panel(self, main_layout):
+        group = QtWidgets.QGroupBox("Перемещение в декартовых координатах")
+        group_layout = QtWidgets.QHBoxLayout()
+
+        self.cartesian_spins = []
+        for axis in ("X", "Y", "Z"):
+            group_layout.addWidget(QtWidgets.QLabel(f"{axis}:"))
+            spin = QtWidgets.QDoubleSpinBox()
+            spin.setRange(-400, 400)
+            spin.setDecimals(1)
+            spin.setSuffix(" мм")
+            group_layout.addWidget(spin)
+            self.cartesian_spins.append(spin)
+
+        group_layout.addWidget(QtWidgets.QLabel("Скорость:"))
+        self.linear_speed_spin = QtWidgets.QSpinBox()
+        self.linear_speed_spin.setRange(5, 500)
+        self.linear_speed_spin.setValue(50)
+        self.linear_speed_spin.setSuffix(" мм/с")
+        group_layout.addWidget(self.linear_speed_spin)
+
+        current_point_button = QtWidgets.QPushButton("Текущая точка")
+        current_point_button.clicked.connect(self.show_current_point)
+        group_layout.addWidget(current_point_button)
+
+        move_button = QtWidgets.QPushButton("Переместить")
+        move_button.clicked.connect(self.move_cartesian)
+        group_layout.addWidget(move_button)
+
+        add_line_button = QtWidgets.QPushButton("Добавить в команды")
+        add_line_button.clicked.connect(self.add_cartesian_commands)
+        group_layout.addWidget(add_line_button)
+
+        group.setLayout(group_layout)
+        group.setVisible(self.profile.arm_kinematics)
+        main_layout.addWidget(group)
+        self.cartesian_group = group
+        self.show_current_point()
+
+    def create_telemetry_panel(self, main_layout):
+        group = QtWidgets.QGroupBox("Телеметрия")
+        group_layout = QtWidgets.QHBoxLayout()
+
+        self.telemetry_label = QtWidgets.QLabel("Нет данных")
+        group_layout.addWidget(self.telemetry_label, 1)
+
+        reset_button = QtWidgets.QPushButton("Сбросить")
+        reset_button.clicked.connect(self.controller.telemetry.reset)
+        group_layout.addWidget(reset_button)
+
+        export_button = QtWidgets.QPushButton("Экспорт")
+        export_button.clicked.connect(self.export_telemetry)
+        group_layout.addWidget(export_button)
+
+        group.setLayout(group_layout)
+        main_layout.addWidget(group)
+
+        # Обновление панели два раза в секунду
+        self.telemetry_timer = QTimer(self)
+        self.telemetry_timer.timeout.connect(self.update_telemetry_panel)
+        self.telemetry_timer.start(500)
+
+    def update_telemetry_panel(self):
+        summary = self.controller.telemetry_summary()
+        text = (f"Команд/с: {summary['commands_per_second']:.0f}   "
+                f"Байт/с: {summary['bytes_per_second']:.0f}   "
+                f"Очередь: {summary['queue_depth']}   "
+                f"Запись: {summary['write_avg_ms']:.2f}/{summary['write_max_ms']:.2f} мс   "
+                f"Ожидание: {summary['queue_wait_avg_ms']:.1f}/{summary['queue_wait_max_ms']:.1f} мс\n"
+                f"Отправлено: {summary['written']} из {summary['enqueued']}   "
+                f"Байт: {summary['bytes_written']}   "
+                f"Заменено: {summary.get('superseded', 0)}   "
+                f"Отброшено: {summary.get('dropped', 0)}")
+        if "ack_sent" in summary:
+            text += (f"\nПодтверждено: {summary['ack_acked']}   "
+                     f"Повторов: {summary['ack_retries']}   "
+                     f"Потеряно: {summary['ack_lost']}   "
+                     f"Задержка подтверждения: {summary['ack_latency_avg_ms']:.1f}/{summary['ack_latency_max_ms']:.1f} мс")
+        self.telemetry_label.setText(text)
+
+    def export_telemetry(self):
+        file_path, selected_filter = QtWidgets.QFileDialog.getSaveFileName(
+            self, "Экспорт телеметрии", "telemetry.csv", "CSV (*.csv);;JSON (*.json)")
+        if not file_path:
+            return
+        if file_path.endswith(".json") or selected_filter.startswith("JSON"):
+            self.controller.telemetry.export_json(file_path, self.controller.telemetry_summary())
+        else:
+            self.controller.telemetry.export_csv(file_path)
+        self.message_label.setText(f"Телеметрия сохранена в {os.path.basename(file_path)}")
+
     def show_company_info(self):
         QtWidgets.QMessageBox.information(self, "О компании", self.company_info)
 
     def show_program_info(self):
         QtWidgets.QMessageBox.information(self, "О программе", self.program_info)
 
-    @staticmethod
-    def get_ports():
-        return [port.device for port in serial.tools.list_ports.comports()]
-
     def refresh_ports(self):
-        self.available_ports = self.get_ports()
+        self.port_watcher.refresh()
+
+    def update_ports(self, ports, added, removed):
+        current = self.port_combobox.currentText()
+        self.port_infos = {port.device: port for port in ports}
+        self.available_ports = [port.device for port in ports]
         self.port_combobox.clear()
-        self.port_combobox.addItems(self.available_ports)
-        if self.available_ports:
-            self.port_combobox.setCurrentIndex(0)
-        else:
-            self.port_combobox.addItem("Нет доступных портов")
-            self.port_combobox.setCurrentIndex(0)
+        for port in ports:
+            self.port_combobox.addItem(port.device)
+            marker = " (Arduino)" if self.board_identifier.is_arduino(port) else ""
+            self.port_combobox.setItemData(self.port_combobox.count() - 1, f"{port.description}{marker}", Qt.ToolTipRole)
+        if not self.available_ports:
+            self.port_combobox.insertItem(0, "Нет доступных портов")
+        # Виртуальная плата для проверки без оборудования
+        self.port_combobox.addItem(SIMULATOR_URL)
+        self.port_combobox.setItemData(self.port_combobox.count() - 1, "Виртуальная плата (симулятор прошивки)",
+                                       Qt.ToolTipRole)
+        self.port_combobox.setCurrentIndex(max(0, self.port_combobox.findText(current)))
         self.connection_label.setText("Список портов обновлен")
 
+        for port in removed:
+            self.drop_port(port)
+        for port in added:
+            key = self.board_identifier.key(port)
+            if key in self.lost_boards and self.auto_reconnect_action.isChecked():
+                self.lost_boards.discard(key)
+                self.add_port(port.device)
+                self.connection_label.setText(f"Плата переподключена: {port.device}")
+
+    def drop_port(self, port_info):
+        # Плата отключена: закрываем её поток записи и запоминаем для переподключения
+        if self.controller.drop(port_info.device):
+            self.lost_boards.add(self.board_identifier.key(port_info))
+            self.connection_label.setText(f"Плата отключена: {port_info.device}")
+
     def send_servo_angle(self, servo_num, angle, speed):
-        if self.ser and self.ser.is_open:
-            command = f"{servo_num},{angle},{speed}\n"
-            self.command_queue.append(command)
+        if self.controller.writers:
+            self.controller.send_servo(servo_num, angle, speed)
         else:
             QtWidgets.QMessageBox.critical(self, "Предупреждение",
                                            "При частой передаче сигнала пин на серво закрывается.")
 
-    def process_command_queue(self):
-        if self.ser and self.ser.is_open and len(self.command_queue) > 0:
-            command = self.command_queue.pop(0)
-            try:
-                self.ser.write(command.encode("utf-8"))
-            except Exception as e:
-                QtWidgets.QMessageBox.critical(self, "Ошибка", f"Произошла ошибка при отправке данных: {str(e)}")
+    def show_serial_error(self, message):
+        QtWidgets.QMessageBox.critical(self, "Ошибка", f"Произошла ошибка при отправке данных: {message}")
+
+    def send_pose(self, angles, speeds):
+        if self.controller.writers:
+            self.controller.move_to(angles, speeds)
+        else:
+            QtWidgets.QMessageBox.critical(self, "Предупреждение",
+                                           "При частой передаче сигнала пин на серво закрывается.")
+
+    def change_protocol(self):
+        self.controller.set_protocol(self.protocol_combobox.currentData())
+
+    def set_smooth_motion(self, enabled):
+        self.controller.smooth_motion = enabled
 
     def update_servo(self, index, angle_value, speed_value):
         self.target_angles[index] = int(angle_value)
         self.target_speeds[index] = int(speed_value)
-        self.send_servo_angle(index + 1, self.target_angles[index], self.target_speeds[index])
+        if self.controller.smooth_motion and self.controller.streamer:
+            self.controller.move_to(self.target_angles, self.target_speeds)
+        else:
+            self.send_servo_angle(index + 1, self.target_angles[index], self.target_speeds[index])
 
     def connect_port(self):
         port = self.port_combobox.currentText()
         if port and port != "Нет доступных портов":
-            self.ser = serial.Serial(port, 9600, timeout=1)
-            self.connection_label.setText(f"Подключено к {port}")
+            self.open_ports([port])
         else:
             self.connection_label.setText("Порт не выбран или недоступен")
 
+    def connect_multiple_ports(self):
+        ports = self.select_ports("Подключение нескольких плат")
+        if ports:
+            self.open_ports(ports)
+
+    def open_ports(self, ports):
+        self.close_port()
+        self.lost_boards.clear()
+        for port in ports:
+            self.add_port(port)
+        if not self.controller.writers:
+            self.connection_label.setText("Нет соединения")
+            return
+        self.connection_label.setText(f"Подключено к {', '.join(self.controller.ports)}")
+
+    def add_port(self, port):
+        # Виртуальная плата получает каналы текущего профиля
+        if port == SIMULATOR_URL:
+            port = f"{SIMULATOR_URL}?profile={self.profile.name}"
+        # Плавное движение начинается от текущих положений ползунков
+        self.controller.angles = list(self.target_angles)
+        self.controller.speeds = list(self.target_speeds)
+        try:
+            self.controller.open(port, self.baud_combobox.currentData(), self.protocol_combobox.currentData(),
+                                 negotiate=self.negotiate_checkbox.isChecked(), ack=self.ack_checkbox.isChecked())
+        except serial.SerialException as e:
+            QtWidgets.QMessageBox.critical(self, "Ошибка", f"Не удалось открыть {port}:\n{e}")
+
+    def select_ports(self, title):
+        """
+        Диалог выбора нескольких COM-портов.
+
+        :return: Список выбранных портов (пустой при отмене).
+        """
+        dialog = QtWidgets.QDialog(self)
+        dialog.setWindowTitle(title)
+        dialog_layout = QtWidgets.QVBoxLayout()
+        ports_list = QtWidgets.QListWidget()
+        for port in self.available_ports:
+            item = QtWidgets.QListWidgetItem(port)
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            item.setCheckState(Qt.Checked)
+            ports_list.addItem(item)
+        dialog_layout.addWidget(ports_list)
+        buttons = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel)
+        buttons.accepted.connect(dialog.accept)
+        buttons.rejected.connect(dialog.reject)
+        dialog_layout.addWidget(buttons)
+        dialog.setLayout(dialog_layout)
+        if dialog.exec_() != QtWidgets.QDialog.Accepted:
+            return []
+        return [ports_list.item(i).text() for i in range(ports_list.count())
+                if ports_list.item(i).checkState() == Qt.Checked]
+
+    def show_baudrate(self, port, rate):
+        if not self.controller.writers:
+            return
+        if rate:
+            self.connection_label.setText(f"Подключено к {port}, {rate} бод")
+        else:
+            self.connection_label.setText(f"Подключено к {port}, скорость не согласована")
+
+    def close_port(self):
+        self.controller.close()
+
+    def closeEvent(self, event):
+        self.port_watcher.stop()
+        self.stop_playback()
+        self.close_port()
+        super().closeEvent(event)
+
     def add_command(self):
-        command = {
-            "angles": self.target_angles.copy(),
-            "speeds": self.target_speeds.copy()
-        }
-        self.command_list.append(command)
-        self.update_command_listbox()
-
-    def update_command_listbox(self):
-        self.command_listbox.clear()
-        for index, cmd in enumerate(self.command_list):
-            self.command_listbox.addItem(f"Команда {index + 1}: {cmd}")
+        # Задержка шага не фиксируется: при воспроизведении действует значение из поля
+        # «Задержка», собственную задержку можно задать через «Правка»
+        self.command_model.append_pose(self.target_angles, self.target_speeds)
+
+    def edit_delays(self):
+        rows = self.selected_rows()
+        if not rows:
+            self.message_label.setText("Команда не выбрана.")
+            return
+        current = self.command_list[rows[0]].delay
+        text, ok = QtWidgets.QInputDialog.getText(
+            self, "Задержка шага", "Задержка выбранных команд, мс (пусто — по умолчанию):",
+            text="" if current is None else str(current))
+        if not ok:
+            return
+        text = text.strip()
+        if text and not text.isdigit():
+            self.message_label.setText("Задержка должна быть целым числом миллисекунд.")
+            return
+        delay = min(int(text), PoseSequence.NO_DELAY - 1) if text else None
+        self.command_model.set_delays(rows, delay)
+        self.saved_count = None
+
+    @staticmethod
+    def format_pose(index, pose):
+        delay = "по умолчанию" if pose.delay is None else f"{pose.delay} мс"
+        return (f"Команда {index + 1}: углы {list(pose.angles)}, скорости {list(pose.speeds)}, "
+                f"задержка {delay}")
+
+    def selected_rows(self):
+        return sorted(index.row() for index in self.command_listbox.selectionModel().selectedRows())
+
+    def select_rows(self, start, stop):
+        selection_model = self.command_listbox.selectionModel()
+        selection_model.setCurrentIndex(self.command_model.index(start), QItemSelectionModel.NoUpdate)
+        selection = QItemSelection(self.command_model.index(start), self.command_model.index(stop - 1))
+        selection_model.select(selection, QItemSelectionModel.ClearAndSelect)
 
     def play_command(self, index):
         if index < len(self.command_list):
-            angles = self.command_list[index]["angles"]
-            speeds = self.command_list[index]["speeds"]
-            for i in range(4):
-                self.send_servo_angle(i + 1, angles[i], speeds[i])
+            pose = self.command_list[index]
+            self.send_pose(pose.angles, pose.speeds)
 
     def step_play(self):
-        selected_indices = self.command_listbox.selectedIndexes()
-        if selected_indices:
-            current_index = selected_indices[0].row()
+        selected_rows = self.selected_rows()
+        if selected_rows:
+            current_index = selected_rows[0]
             self.play_command(current_index)
             self.message_label.setText(f"Воспроизведена команда {current_index + 1}")
         else:
             self.message_label.setText("Команда не выбрана.")
 
     def auto_play(self):
-        delay = int(self.delay_entry.text())
-        for i in range(len(self.command_list)):
-            self.play_command(i)
-            time.sleep(delay / 1000)
+        self.start_playback(self.command_list.copy())
+
+    def start_playback(self, poses):
+        """
+        Запускает воспроизведение поз: списка или SequenceFile, читаемого по мере проигрывания.
+        """
+        if not self.delay_entry.text().isdigit():
+            self.message_label.setText("Задержка должна быть целым числом миллисекунд.")
+            return
+        if not self.controller.writers:
+            QtWidgets.QMessageBox.critical(self, "Ошибка", "Нет подключения к плате.")
+            return
+        try:
+            servo_count = poses.servo_count
+            empty = not len(poses)
+        except (OSError, ValueError) as e:
+            self.message_label.setText(f"Не удалось открыть последовательность: {e}")
+            return
+        if servo_count != self.profile.servo_count:
+            self.message_label.setText(self.count_mismatch(servo_count))
+            return
+        if empty:
+            self.message_label.setText("Последовательность пуста.")
+            return
+        self.pause_button.setText("Пауза")
+        self.controller.play(poses, int(self.delay_entry.text()), loop=self.loop_checkbox.isChecked(),
+                             on_step=self.playback_step.emit, on_finished=self.playback_finished.emit)
+
+    def toggle_pause(self):
+        player = self.controller.player
+        if not player:
+            return
+        if player.paused:
+            player.resume()
+            self.pause_button.setText("Пауза")
+        else:
+            player.pause()
+            self.pause_button.setText("Продолжить")
+            self.message_label.setText("Воспроизведение приостановлено")
+
+    def stop_playback(self):
+        self.controller.stop_playback()
+
+    def show_playback_step(self, index):
+        player = self.controller.player
+        if not player:
+            return
+        if isinstance(player.poses, PoseSequence):
+            self.command_listbox.setCurrentIndex(self.command_model.index(index))
+        self.message_label.setText(f"Воспроизведение: команда {index + 1} из {len(player.poses)}")
+
+    def finish_playback(self):
+        if self.controller.player and self.controller.player.done:
+            self.controller.player = None
+            self.message_label.setText("Воспроизведение завершено")
+        self.pause_button.setText("Пауза")
+
+    def ask_joint_values(self, title, label, default):
+        """
+        Запрашивает по одному числу на сервопривод через запятую.
+
+        :return: Список чисел или None при отмене или ошибке ввода.
+        """
+        text, ok = QtWidgets.QInputDialog.getText(self, title, label, text=", ".join([default] * len(self.target_angles)))
+        if not ok:
+            return None
+        try:
+            values = [float(value) for value in text.split(",")]
+        except ValueError:
+            self.message_label.setText("Введите числа через запятую.")
+            return None
+        if len(values) == 1:
+            values *= len(self.target_angles)
+        return values
+
+    def transform_sequence(self, transform, message):
+        transform(self.command_list)
+        self.saved_count = None
+        self.command_model.refresh()
+        self.message_label.setText(message)
+
+    def offset_sequence(self):
+        offsets = self.ask_joint_values("Сместить углы", "Смещение для каждого сервопривода, °:", "0")
+        if offsets:
+            self.transform_sequence(lambda sequence: sequence.offset_angles(offsets), "Углы смещены")
+
+    def scale_sequence(self):
+        factors = self.ask_joint_values("Масштабировать углы", "Коэффициент размаха относительно 90°:", "1")
+        if factors:
+            self.transform_sequence(lambda sequence: sequence.scale_angles(factors), "Углы масштабированы")
+
+    def stretch_sequence(self):
+        # Шаги без собственной задержки идут с задержкой из поля «Задержка»;
+        # чтобы темп менялся и у них, эта задержка фиксируется в шагах
+        if not self.delay_entry.text().isdigit():
+            self.message_label.setText("Задержка должна быть целым числом миллисекунд.")
+            return
+        default_delay = int(self.delay_entry.text())
+        factor, ok = QtWidgets.QInputDialog.getDouble(self, "Изменить темп", "Множитель задержек:", 1.0, 0.01, 100.0, 2)
+        if ok:
+            self.transform_sequence(lambda sequence: sequence.time_stretch(factor, default_delay), "Задержки изменены")
+
+    def toggle_recording(self, enabled):
+        if enabled:
+            self.recorder.clear()
+            self.record_sample()
+            self.record_timer.start(round(1000 / self.record_rate))
+            self.message_label.setText(f"Запись движения с частотой {self.record_rate} Гц")
+            return
+        self.record_timer.stop()
+        self.record_sample()
+        recorded = self.recorder.to_sequence(self.record_tolerance)
+        self.command_model.append_sequence(recorded)
+        self.message_label.setText(f"Запись завершена: выборок {len(self.recorder)}, команд {len(recorded)}")
+        self.recorder.clear()
+
+    def record_sample(self):
+        self.recorder.sample(self.target_angles, self.target_speeds)
+
+    def ask_record_rate(self):
+        rate, ok = QtWidgets.QInputDialog.getInt(self, "Частота записи", "Выборок в секунду:",
+                                                 self.record_rate, 1, 200)
+        if ok:
+            self.record_rate = rate
+            if self.record_timer.isActive():
+                self.record_timer.setInterval(round(1000 / rate))
+
+    def ask_record_tolerance(self):
+        tolerance, ok = QtWidgets.QInputDialog.getDouble(self, "Допуск прореживания", "Отклонение, градусы:",
+                                                         self.record_tolerance, 0, 45, 1)
+        if ok:
+            self.record_tolerance = tolerance
+
+    def set_slider_angles(self, angles):
+        # Ползунки переставляются без отправки команд: позу уже передаёт проигрыватель
+        for i, angle in enumerate(angles):
+            self.target_angles[i] = angle
+            self.angle_sliders[i].blockSignals(True)
+            self.angle_sliders[i].setValue(angle)
+            self.angle_sliders[i].blockSignals(False)
+
+    def show_current_point(self):
+        if not self.profile.arm_kinematics:
+            return
+        for spin, value in zip(self.cartesian_spins, self.arm.forward(self.target_angles)):
+            spin.setValue(value)
+
+    def cartesian_line(self):
+        """
+        Уставки прямолинейного перемещения из текущей позы в точку из полей X, Y, Z.
+
+        :return: PoseSequence или None, если точка недостижима.
+        """
+        target = tuple(spin.value() for spin in self.cartesian_spins)
+        try:
+            return self.arm.line_sequence(self.target_angles, target, self.linear_speed_spin.value(),
+                                          self.controller.stream_rate())
+        except UnreachableError as e:
+            self.message_label.setText(str(e))
+            return None
+
+    def move_cartesian(self):
+        if not self.controller.writers:
+            QtWidgets.QMessageBox.critical(self, "Ошибка", "Нет подключения к плате.")
+            return
+        sequence = self.cartesian_line()
+        if sequence is None:
+            return
+        self.pause_button.setText("Пауза")
+        self.controller.play(sequence, 0, on_finished=self.playback_finished.emit)
+        self.set_slider_angles(sequence[len(sequence) - 1].angles)
+
+    def add_cartesian_commands(self):
+        sequence = self.cartesian_line()
+        if sequence is None:
+            return
+        self.command_model.append_sequence(sequence)
+        # Следующий отрезок траектории начнётся из конца этого
+        self.set_slider_angles(sequence[len(sequence) - 1].angles)
+        self.message_label.setText(f"Добавлено команд прямолинейного перемещения: {len(sequence)}")
+
+    def ask_arm_dimensions(self):
+        arm = self.arm
+        current = f"{arm.base_height:g}, {arm.upper_arm:g}, {arm.forearm:g}, {arm.tool_length:g}"
+        text, ok = QtWidgets.QInputDialog.getText(
+            self, "Размеры звеньев", "Высота основания, нижнее звено, верхнее звено, захват (мм):", text=current)
+        if not ok:
+            return
+        try:
+            values = [float(value) for value in text.split(",")]
+        except ValueError:
+            values = []
+        if len(values) != 4 or min(values) < 0:
+            self.message_label.setText("Нужно четыре неотрицательных числа через запятую.")
+            return
+        arm.base_height, arm.upper_arm, arm.forearm, arm.tool_length = values
+        arm.save(ARM_CONFIG_PATH)
+        self.show_current_point()
+        self.message_label.setText("Размеры руки сохранены")
+
+    @staticmethod
+    def load_profile(name):
+        try:
+            return DeviceProfile.load(name)
+        except (OSError, ValueError):
+            return DEFAULT_PROFILE
+
+    def update_profile_menu(self):
+        # Список перечитывается при каждом открытии: профили можно добавлять в папку вручную
+        menu = self.profile_menu
+        menu.clear()
+        for name in DeviceProfile.available():
+            try:
+                title = DeviceProfile.load(name).title
+            except (OSError, ValueError):
+                title = "ошибка в описании"
+            action = menu.addAction(f"{title} ({name})")
+            action.setCheckable(True)
+            action.setChecked(name == self.profile.name)
+            action.triggered.connect(lambda checked=False, name=name: self.choose_profile(name))
+        menu.addSeparator()
+        menu.addAction("Импортировать профиль...", self.import_profile)
+        menu.addAction("Калибровка...", self.calibrate_profile)
+        menu.addAction("Исходное положение", self.move_home)
+
+    def choose_profile(self, name):
+        try:
+            profile = DeviceProfile.load(name)
+        except (OSError, ValueError) as e:
+            QtWidgets.QMessageBox.critical(self, "Ошибка", f"Не удалось загрузить профиль:\n{e}")
+            return
+        self.set_profile(profile)
+
+    def import_profile(self):
+        file_path, _ = QtWidgets.QFileDialog.getOpenFileName(self, "Импортировать профиль", "", "Профили (*.json)")
+        if not file_path:
+            return
+        try:
+            profile = DeviceProfile.load(file_path)
+            profile.save()
+        except (OSError, ValueError) as e:
+            QtWidgets.QMessageBox.critical(self, "Ошибка", f"Не удалось загрузить профиль:\n{e}")
+            return
+        self.set_profile(profile)
+
+    def set_profile(self, profile):
+        """
+        Переключает окно на другое устройство. Порты закрываются: прошивка
+        подключённых плат собрана под прежний профиль.
+        """
+        self.stop_playback()
+        self.record_action.setChecked(False)
+        self.close_port()
+        self.connection_label.setText("Нет соединения")
+        self.profile = profile
+        self.settings.setValue("profile", profile.name)
+        count = profile.servo_count
+        self.target_angles = profile.homes
+        self.target_speeds = [50] * count
+        self.recorder = MotionRecorder(count)
+        if self.command_list.servo_count != count:
+            self.command_list = PoseSequence(count)
+            self.sequence_file = None
+            self.saved_count = 0
+            self.command_model.set_sequence(self.command_list)
+        self.create_channel_sliders()
+        self.cartesian_group.setVisible(profile.arm_kinematics)
+        self.show_current_point()
+        self.message_label.setText(f"Профиль «{profile.title}»: каналов {count}")
+
+    def calibrate_profile(self):
+        profile = self.profile
+        text, ok = QtWidgets.QInputDialog.getText(
+            self, "Калибровка", "Поправка угла для каждого канала, °:",
+            text=", ".join(str(channel.offset) for channel in profile.channels))
+        if not ok:
+            return
+        try:
+            offsets = [int(value) for value in text.split(",")]
+        except ValueError:
+            offsets = []
+        if len(offsets) != profile.servo_count:
+            self.message_label.setText(f"Нужно {profile.servo_count} целых чисел через запятую.")
+            return
+        try:
+            calibrated = DeviceProfile(profile.name, profile.title,
+                                       [channel._replace(offset=offset) for channel, offset in zip(profile.channels, offsets)],
+                                       profile.fqbn, profile.arm_kinematics)
+        except ValueError as e:
+            self.message_label.setText(str(e))
+            return
+        calibrated.save()
+        self.profile = calibrated
+        self.message_label.setText("Поправки сохранены; они вступят в силу после загрузки прошивки")
+
+    def move_home(self):
+        # Все каналы переводятся одной командой позы
+        self.set_slider_angles(self.profile.homes)
+        self.send_pose(self.target_angles, self.target_speeds)
+
+    def count_mismatch(self, count):
+        return (f"Последовательность рассчитана на {count} сервоприводов, "
+                f"в профиле «{self.profile.title}» их {self.profile.servo_count}")
 
     def delete_command(self):
-        selected_index = self.command_listbox.currentRow()
-        if selected_index >= 0:
-            self.command_list.pop(selected_index)
-            self.update_command_listbox()
+        rows = self.selected_rows()
+        if rows:
+            self.command_model.remove_rows(rows)
+            self.saved_count = None
+
+    def duplicate_commands(self):
+        rows = self.selected_rows()
+        if rows:
+            self.select_rows(*self.command_model.duplicate_rows(rows))
+            self.saved_count = None
+
+    def move_commands(self, delta):
+        # Перемещается непрерывный блок от первой до последней выделенной строки
+        rows = self.selected_rows()
+        if not rows:
+            return
+        start = self.command_model.move_range(rows[0], rows[-1] + 1, delta)
+        if start is not None:
+            self.select_rows(start, start + rows[-1] + 1 - rows[0])
+            self.saved_count = None
 
     def save_all_commands(self):
-        with open("media/commands/commands.json", "w") as f:
-            json.dump(self.command_list, f)
-        self.message_label.setText("Команды сохранены в commands.json")
+        file_path = self.sequence_file.path if self.sequence_file is not None else None
+        if not file_path:
+            os.makedirs(COMMANDS_DIR, exist_ok=True)
+            file_path, _ = QtWidgets.QFileDialog.getSaveFileName(
+                self, "Сохранить команды", os.path.join(COMMANDS_DIR, "commands.rcs"),
+                "Последовательности (*.rcs)")
+            if not file_path:
+                return
+            if not file_path.endswith(".rcs"):
+                file_path += ".rcs"
+            # Новый файл (или чужой существующий) всегда записывается целиком
+            self.sequence_file = SequenceFile(file_path)
+            self.saved_count = None
+
+        # Если с последнего сохранения в этот файл команды только добавлялись, дописываем их в конец
+        try:
+            if self.saved_count is not None and os.path.exists(file_path):
+                self.sequence_file.append(self.command_list, self.saved_count)
+            else:
+                self.sequence_file.write(self.command_list)
+        except (OSError, ValueError) as e:
+            self.saved_count = None
+            self.message_label.setText(f"Не удалось сохранить команды: {e}")
+            return
+        self.saved_count = len(self.command_list)
+        self.message_label.setText(f"Команды сохранены в {os.path.basename(file_path)}")
+
+    def save_commands_as(self):
+        self.sequence_file = None
+        self.save_all_commands()
 
     def load_all_commands(self):
+        file_path, _ = QtWidgets.QFileDialog.getOpenFileName(
+            self, "Загрузить команды", COMMANDS_DIR, "Последовательности (*.rcs *.json)")
+        if not file_path:
+            return
         try:
-            with open("media/commands/commands.json", "r") as f:
-                self.command_list = json.load(f)
-            self.update_command_listbox()
-            self.message_label.setText("Команды загружены из commands.json")
-        except FileNotFoundError:
-            self.command_list = []
-            self.message_label.setText("Файл команд не найден.")
+            if file_path.endswith(".json"):
+                with open(file_path, "r") as f:
+                    sequence = PoseSequence.from_poses(json.load(f))
+                sequence_file = None
+            else:
+                sequence_file = SequenceFile(file_path)
+                sequence = sequence_file.read()
+        except (OSError, ValueError) as e:
+            self.message_label.setText(f"Не удалось загрузить команды: {e}")
+            return
+        if sequence.servo_count != self.profile.servo_count:
+            self.message_label.setText(self.count_mismatch(sequence.servo_count))
+            return
+        if sequence_file is None:
+            # Старый формат импортируется в .rcs рядом с исходным файлом; существующий
+            # файл заменяется только с согласия пользователя, иначе путь спросят при сохранении
+            rcs_path = os.path.splitext(file_path)[0] + ".rcs"
+            if not os.path.exists(rcs_path) or QtWidgets.QMessageBox.question(
+                    self, "Импорт команд", f"Файл {os.path.basename(rcs_path)} уже существует. Заменить его?"
+            ) == QtWidgets.QMessageBox.Yes:
+                sequence_file = SequenceFile(rcs_path)
+                try:
+                    sequence_file.write(sequence)
+                except OSError as e:
+                    self.message_label.setText(f"Не удалось сохранить {os.path.basename(rcs_path)}: {e}")
+                    sequence_file = None
+        self.command_list = sequence
+        self.sequence_file = sequence_file
+        self.saved_count = len(self.command_list) if sequence_file is not None else None
+        self.command_model.set_sequence(self.command_list)
+        self.message_label.setText(f"Команды загружены из {os.path.basename(file_path)}")
+
+    def play_file(self):
+        file_path, _ = QtWidgets.QFileDialog.getOpenFileName(
+            self, "Воспроизвести файл", COMMANDS_DIR, "Последовательности (*.rcs)")
+        if file_path:
+            # Позы читаются из файла по мере воспроизведения
+            self.start_playback(SequenceFile(file_path))
 
 
     @staticmethod
@@ -404,71 +1251,83 @@ class ServoControllerApp(QtWidgets.QWidget):
 
         return os.path.abspath(file_name)
 
-    def is_arduino_port(self, port):
-        result = subprocess.run(["arduino-cli", "board", "list"], capture_output=True, text=True)
-        return port in result.stdout
-
     def upload_firmware(self):
-        current_directory_name = f"{os.path.basename(os.getcwd())}.ino"
-        temp_name = self.create_ino_file(current_directory_name, arduino_code)
-
-        if not os.path.exists(temp_name):
-            QtWidgets.QMessageBox.critical(self, "Ошибка", f"Файл прошивки не найден:\n{temp_name}")
-            return
-
         port = self.port_combobox.currentText()
         if not port or port == "Нет доступных портов":
             QtWidgets.QMessageBox.critical(self, "Ошибка", "Выберите COM порт.")
             return
-
-        # Проверяем, является ли выбранный порт портом Arduino
-        if not self.is_arduino_port(port):
-            QtWidgets.QMessageBox.critical(self, "Ошибка", "Выбранный порт не поддерживает Arduino плату.")
+        if port.startswith(SIMULATOR_URL):
+            QtWidgets.QMessageBox.information(self, "Прошивка", "Виртуальная плата уже работает на модели прошивки.")
             return
+        self.flash_ports([port])
 
-        try:
-            if platform.system() == "Windows":
-                subprocess.run(["arduino-cli", "core", "install", "arduino:avr"], check=True, creationflags=subprocess.CREATE_NO_WINDOW)
-                subprocess.run(["arduino-cli", "lib", "install", "Servo"], check=True, creationflags=subprocess.CREATE_NO_WINDOW)
-            else:
-                subprocess.run(["arduino-cli", "core", "install", "arduino:avr"], check=True)
-                subprocess.run(["arduino-cli", "lib", "install", "Servo"], check=True)
-
-            compile_command = [
-                "arduino-cli",
-                "compile",
-                "--fqbn", "arduino:avr:nano:cpu=atmega168",
-                temp_name
-            ]
-            if platform.system() == "Windows":
-                subprocess.run(compile_command, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, creationflags=subprocess.CREATE_NO_WINDOW)
-            else:
-                subprocess.run(compile_command, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-            upload_command = [
-                "arduino-cli",
-                "upload",
-                "-p", port,
-                "--fqbn", "arduino:avr:nano:cpu=atmega168",
-                temp_name
-            ]
-            if platform.system() == "Windows":
-                process = subprocess.run(upload_command, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, creationflags=subprocess.CREATE_NO_WINDOW,  timeout=30)
-            else:
-                process = subprocess.run(upload_command, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    def upload_firmware_multiple(self):
+        ports = self.select_ports("Прошивка нескольких плат")
+        if ports:
+            self.flash_ports(ports)
 
-            if process.returncode == 0:
-                QtWidgets.QMessageBox.information(self, "Успех", "Прошивка успешно загружена!")
-            else:
-                QtWidgets.QMessageBox.critical(self, "Ошибка",
-                                               f"Не удалось загрузить прошивку:\n{process.stderr.decode()}")
-        except subprocess.TimeoutExpired:
-        # Если загрузка длится слишком долго — выводим сообщение и прерываем процесс
-            QtWidgets.QMessageBox.critical(self, "Предупреждение", "Выбран не тот порт или не правильная плата.")
-        except subprocess.CalledProcessError as e:
-            QtWidgets.QMessageBox.critical(self, "Ошибка", f"Не удалось загрузить прошивку:\n{e.stderr.decode()}")
-        except Exception as e:
-            QtWidgets.QMessageBox.critical(self, "Неожиданная ошибка", str(e))
+    def flash_ports(self, ports):
+        if self.builder and self.builder.is_alive():
+            return
+
+        # Порты нужны arduino-cli для загрузки
+        if any(port in ports for port in self.controller.ports):
+            self.close_port()
+            self.connection_label.setText("Нет соединения")
+
+        self.build_stage = "Подготовка"
+        self.board_statuses = {port: "ожидание" for port in ports}
+        port_infos = {port: self.port_infos[port] for port in ports if port in self.port_infos}
+        known_ports = [port for port, info in port_infos.items() if self.board_identifier.is_arduino(info)]
+
+        def remember(port, is_arduino):
+            if port in port_infos:
+                self.board_identifier.remember(port_infos[port], is_arduino)
+
+        self.builder = FirmwareBuilder(build_firmware(self.baud_combobox.currentData(), profile=self.profile), ports,
+                                       fqbn=self.profile.fqbn,
+                                       known_ports=known_ports,
+                                       on_identified=remember,
+                                       on_progress=self.build_progress.emit,
+                                       on_board=self.board_status.emit,
+                                       on_finished=self.build_finished.emit)
+        self.build_dialog = QtWidgets.QProgressDialog(self.build_stage, "Отмена", 0, 100, self)
+        self.build_dialog.setWindowTitle("Загрузка прошивки")
+        self.build_dialog.setMinimumDuration(0)
+        self.build_dialog.canceled.connect(self.builder.cancel)
+        self.build_dialog.show()
+        self.builder.start()
+
+    def show_build_progress(self, message, percent):
+        self.build_stage = message
+        if self.build_dialog:
+            self.build_dialog.setValue(percent)
+        self.update_build_label()
+
+    def show_board_status(self, port, status):
+        self.board_statuses[port] = status
+        self.update_build_label()
+
+    def update_build_label(self):
+        if not self.build_dialog:
+            return
+        lines = [self.build_stage]
+        if len(self.board_statuses) > 1:
+            lines += [f"{port}: {status}" for port, status in self.board_statuses.items()]
+        self.build_dialog.setLabelText("\n".join(lines))
+
+    def finish_build(self, success, message):
+        if self.build_dialog:
+            self.build_dialog.canceled.disconnect()
+            self.build_dialog.close()
+            self.build_dialog = None
+        self.builder = None
+        if len(self.board_statuses) > 1:
+            message += "\n\n" + "\n".join(f"{port}: {status}" for port, status in self.board_statuses.items())
+        if success:
+            QtWidgets.QMessageBox.information(self, "Успех", message)
+        else:
+            QtWidgets.QMessageBox.critical(self, "Ошибка", message)
 
 
 if __name__ == "__main__":
@@ -1,5 +1,8 @@
 import os
 import sys
+import importlib
+import threading
+from collections import namedtuple
 from PyQt5 import QtWidgets, QtGui, QtCore
 import subprocess
 
@@ -7,12 +10,53 @@ textManagerServo = "Управляет сервоприводами и сенс
 textRoboSpider = "Управляет роботом-пауком, обеспечивая его передвижение, манипуляции и взаимодействие с окружающей средой."
 textHaus = "Автоматизация и управление системами умного дома, включая освещение, безопасность и климат-контроль."
 
+# Программа запускается в этом же процессе, если в модуле module есть класс окна
+# window_class, иначе — отдельным процессом из файла module.py
+Program = namedtuple("Program", ["title", "description", "image_path", "module", "window_class"])
+
+PROGRAMS = [
+    Program("Менеджер Сервоприводов", textManagerServo, "media/images/servo.png",
+            "ControllerManager", "ServoControllerApp"),
+    Program("РобоПаук", textRoboSpider, "media/images/pauk.png", "program_two", None),
+    Program("Умный Дом", textHaus, "media/images/smarthouse.png", "program_three", None),
+]
+
+THUMBNAIL_SIZE = QtCore.QSize(200, 150)
+THUMBNAIL_CACHE_DIR = os.path.join(os.environ.get("LOCALAPPDATA") or os.path.expanduser("~/.cache"),
+                                   "RoboCore", "thumbnails")
+
+
+def load_thumbnail(image_path, size=THUMBNAIL_SIZE):
+    """
+    Загружает уменьшенную копию изображения из кэша, при первом обращении создаёт её.
+
+    :param image_path: Путь к исходному изображению.
+    :param size: Размер, в который вписывается картинка с сохранением пропорций.
+    :return: QPixmap нужного размера.
+    """
+    name = os.path.splitext(os.path.basename(image_path))[0]
+    try:
+        stamp = int(os.path.getmtime(image_path))
+    except OSError:
+        return QtGui.QPixmap()
+    cache_path = os.path.join(THUMBNAIL_CACHE_DIR, f"{name}_{size.width()}x{size.height()}_{stamp}.png")
+    pixmap = QtGui.QPixmap(cache_path)
+    if pixmap.isNull():
+        pixmap = QtGui.QPixmap(image_path).scaled(size, QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation)
+        os.makedirs(THUMBNAIL_CACHE_DIR, exist_ok=True)
+        pixmap.save(cache_path, "PNG")
+    return pixmap
+
 
 # Главное окно выбора программы
 class MainApp(QtWidgets.QWidget):
     def __init__(self):
         super().__init__()
+        # Открытые окна программ: повторный запуск выводит окно на передний план
+        self.windows = {}
         self.init_ui()
+        # Модули программ импортируются в фоне, когда окно уже показано
+        QtCore.QTimer.singleShot(0, self.preload_programs)
 
     def init_ui(self):
         self.setWindowTitle("РобоЯдро")
@@ -20,16 +64,11 @@ class MainApp(QtWidgets.QWidget):
         self.resize(800, 400)
         layout = QtWidgets.QHBoxLayout()
 
-        # Создаем три карточки
-        card1 = self.create_card("Менеджер Сервоприводов", textManagerServo, "media/images/servo.png",
-                                 self.launch_controller_manager)
-        card2 = self.create_card("РобоПаук", textRoboSpider, "media/images/pauk.png", self.launch_program_two)
-        card3 = self.create_card("Умный Дом", textHaus, "media/images/smarthouse.png", self.launch_program_three)
-
-        # Выравниваем карточки по центру
-        layout.addWidget(card1)
-        layout.addWidget(card2)
-        layout.addWidget(card3)
+        # Карточка на каждую программу
+        for program in PROGRAMS:
+            card = self.create_card(program.title, program.description, program.image_path,
+                                    lambda checked=False, program=program: self.launch_program(program))
+            layout.addWidget(card)
 
         # Настраиваем основной layout
         self.setLayout(layout)
@@ -40,8 +79,7 @@ class MainApp(QtWidgets.QWidget):
 
         # Изображение
         image_label = QtWidgets.QLabel(self)
-        pixmap = QtGui.QPixmap(image_path)
-        image_label.setPixmap(pixmap.scaled(200, 150, QtCore.Qt.KeepAspectRatio))
+        image_label.setPixmap(load_thumbnail(image_path))
         image_label.setAlignment(QtCore.Qt.AlignCenter)
 
         # Заголовок
@@ -70,18 +108,33 @@ class MainApp(QtWidgets.QWidget):
         return card_widget
 
     @staticmethod
-    def launch_controller_manager():
-        from ControllerManager import ServoControllerApp
-        window = ServoControllerApp()
-        window.show()
-
-    @staticmethod
-    def launch_program_two(self):
-        subprocess.Popen(['python', 'program_two.py'])
-
-    @staticmethod
-    def launch_program_three(self):
-        subprocess.Popen(['python', 'program_three.py'])
+    def preload_programs():
+        # Импорт выполняется под блокировкой импорта Python: клик во время
+        # предзагрузки просто дождётся её окончания
+        for program in PROGRAMS:
+            if program.window_class:
+                threading.Thread(target=importlib.import_module, args=(program.module,), daemon=True).start()
+
+    def launch_program(self, program):
+        window = self.windows.get(program.module)
+        if window is not None:
+            window.showNormal()
+            window.raise_()
+            window.activateWindow()
+            return
+        if program.window_class:
+            window_class = getattr(importlib.import_module(program.module), program.window_class)
+            window = window_class()
+            window.setAttribute(QtCore.Qt.WA_DeleteOnClose)
+            window.destroyed.connect(lambda _=None, module=program.module: self.windows.pop(module, None))
+            self.windows[program.module] = window
+            window.show()
+            return
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), f"{program.module}.py")
+        if not os.path.exists(script):
+            QtWidgets.QMessageBox.information(self, program.title, "Программа пока не установлена.")
+            return
+        subprocess.Popen([sys.executable, script], cwd=os.path.dirname(script))
 
 
 # Основной блок программы
@@ -0,0 +1,213 @@
+import argparse
+import json
+import statistics
+import sys
+import threading
+import time
+
+from ServoCore import (PROTOCOL_TEXT, PROTOCOL_BINARY, BAUD_RATES, SIMULATOR_URL, PoseSequence,
+                       ServoController, DeviceProfile, DEFAULT_PROFILE)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+def open_simulator(baudrate, protocol, profile=DEFAULT_PROFILE):
+    controller = ServoController(profile.servo_count)
+    writer = controller.open(f"{SIMULATOR_URL}?profile={profile.name}", baudrate, protocol)
+    return controller, writer.ser
+
+
+def bench_throughput(baudrate, protocol, duration, profile=DEFAULT_PROFILE):
+    """
+    Сплошной поток команд на все сервоприводы по очереди: сколько команд плата
+    применяет в секунду и какая доля пропускной способности канала занята.
+    """
+    controller, ser = open_simulator(baudrate, protocol, profile)
+    started = time.perf_counter()
+    sent = 0
+    while time.perf_counter() - started < duration:
+        controller.send_servo(sent % profile.servo_count + 1, sent % 181, 0)
+        sent += 1
+        time.sleep(0.0002)
+    elapsed = time.perf_counter() - started
+    _, stats = ser.device_state()
+    summary = controller.telemetry_summary()
+    controller.close()
+    return {
+        "sent_per_second": sent / elapsed,
+        "applied_per_second": stats["commands"] / elapsed,
+        "link_utilization": stats["bytes_received"] * 10 / baudrate / elapsed,
+        "superseded": summary["superseded"],
+        "overruns": stats["overruns"],
+    }
+
+
+def bench_latency(baudrate, protocol, count, profile=DEFAULT_PROFILE):
+    """
+    Редкие одиночные команды: время от постановки в очередь до применения платой.
+    """
+    controller, ser = open_simulator(baudrate, protocol, profile)
+    enqueued = []
+    for i in range(count):
+        enqueued.append(time.perf_counter())
+        controller.send_servo(1, i % 181, 0)
+        time.sleep(0.02)
+    controller.wait_idle(timeout=5)
+    time.sleep(0.1)
+    ser.device_state()
+    applied = [moment for moment, _ in ser.device.history]
+    controller.close()
+    latencies = [(done - start) * 1000 for start, done in zip(enqueued, applied)]
+    return {
+        "latency_avg_ms": statistics.mean(latencies),
+        "latency_p50_ms": percentile(latencies, 0.5),
+        "latency_p95_ms": percentile(latencies, 0.95),
+        "latency_max_ms": max(latencies),
+        "lost": count - len(applied),
+    }
+
+
+def bench_burst(baudrate, protocol, duration, profile=DEFAULT_PROFILE):
+    """
+    Перетаскивание ползунка: событие valueChanged каждую миллисекунду.
+    Измеряются глубина очереди команд, заполнение буфера драйвера порта и
+    время, за которое плата догоняет последнее положение.
+    """
+    controller, ser = open_simulator(baudrate, protocol, profile)
+    writer = controller.writers[0]
+    depths = []
+    buffered = []
+    stop = threading.Event()
+
+    def sample_depth():
+        while not stop.is_set():
+            depths.append(len(writer.command_queue))
+            buffered.append(len(ser.to_device))
+            time.sleep(0.001)
+
+    sampler = threading.Thread(target=sample_depth, daemon=True)
+    sampler.start()
+    started = time.perf_counter()
+    events = 0
+    angle, step = 0, 1
+    while time.perf_counter() - started < duration:
+        last_event = time.perf_counter()
+        controller.send_servo(1, angle, 0)
+        events += 1
+        final = (1, angle, 0)
+        if not 0 <= angle + step <= 180:
+            step = -step
+        angle += step
+        time.sleep(0.001)
+    # Последняя применённая платой команда после опустошения очереди и буфера драйвера
+    controller.wait_idle(timeout=10)
+    ser.flush()
+    time.sleep(0.05)
+    ser.device_state()
+    moment, command = ser.device.history[-1]
+    settled = moment if tuple(command) == final else None
+    stop.set()
+    sampler.join()
+    summary = controller.telemetry_summary()
+    controller.close()
+    return {
+        "events": events,
+        "queue_depth_avg": statistics.mean(depths),
+        "queue_depth_max": max(depths),
+        "driver_buffer_max_bytes": max(buffered),
+        "superseded_ratio": summary["superseded"] / events,
+        "settle_ms": (settled - last_event) * 1000 if settled is not None else None,
+    }
+
+
+def bench_playback(baudrate, protocol, count, delay, profile=DEFAULT_PROFILE):
+    """
+    Воспроизведение последовательности: отклонение моментов применения поз от расписания.
+    """
+    controller, ser = open_simulator(baudrate, protocol, profile)
+    n = profile.servo_count
+    sequence = PoseSequence(n)
+    for i in range(count):
+        sequence.append([i % 181] + [90] * (n - 1), [0] * n, delay)
+    finished = threading.Event()
+    controller.play(sequence, delay, on_finished=finished.set)
+    finished.wait()
+    controller.wait_idle(timeout=5)
+    time.sleep(0.1)
+    ser.device_state()
+    applied = [moment for moment, _ in ser.device.history]
+    controller.close()
+    errors = [(moment - applied[0]) * 1000 - i * delay for i, moment in enumerate(applied)]
+    return {
+        "timing_error_avg_ms": statistics.mean(abs(error) for error in errors),
+        "timing_error_max_ms": max(abs(error) for error in errors),
+        "jitter_ms": statistics.pstdev(errors),
+        "lost": count - len(applied),
+    }
+
+
+def run(baudrate, protocols, duration, profile=DEFAULT_PROFILE):
+    results = {}
+    for protocol in protocols:
+        prefix = f"{protocol}@{baudrate}"
+        for name, result in (("throughput", bench_throughput(baudrate, protocol, duration, profile)),
+                             ("latency", bench_latency(baudrate, protocol, 50, profile)),
+                             ("burst", bench_burst(baudrate, protocol, duration, profile)),
+                             ("playback", bench_playback(baudrate, protocol, 50, 40, profile))):
+            for metric, value in result.items():
+                results[f"{prefix}.{name}.{metric}"] = value
+    return results
+
+
+def print_results(results, baseline=None):
+    for key, value in results.items():
+        line = f"{key:48} {format_value(value):>12}"
+        if baseline and key in baseline:
+            old = baseline[key]
+            line += f" {format_value(old):>12}"
+            if isinstance(value, (int, float)) and isinstance(old, (int, float)) and old:
+                line += f" {(value - old) / abs(old) * 100:+8.1f}%"
+        print(line)
+
+
+def format_value(value):
+    if value is None:
+        return "-"
+    return f"{value:.3f}" if isinstance(value, float) else str(value)
+
+
+def main(argv=None):
+    """
+    Замеры пути управления на виртуальной плате sim://.
+
+    Результаты можно сохранить в JSON (--output) и сравнить с прошлым
+    запуском (--compare), чтобы увидеть регрессии между версиями.
+    """
+    parser = argparse.ArgumentParser(prog="ServoBenchmark", description="Замеры производительности канала управления")
+    parser.add_argument("-b", "--baudrate", type=int, default=115200, choices=BAUD_RATES)
+    parser.add_argument("--protocol", action="append", choices=(PROTOCOL_TEXT, PROTOCOL_BINARY),
+                        help="протокол; по умолчанию оба")
+    parser.add_argument("--profile", default=DEFAULT_PROFILE.name, help="профиль устройства виртуальной платы")
+    parser.add_argument("--duration", type=float, default=2.0, help="длительность замеров потока, с")
+    parser.add_argument("--output", help="сохранить результаты в JSON")
+    parser.add_argument("--compare", help="JSON с результатами прошлого запуска")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+    results = run(args.baudrate, args.protocol or [PROTOCOL_TEXT, PROTOCOL_BINARY], args.duration,
+                  DeviceProfile.load(args.profile))
+    print_results(results, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
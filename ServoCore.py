@@ -0,0 +1,2192 @@
+import os
+import argparse
+import csv
+import hashlib
+import json
+import time
+import threading
+from array import array
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from string import Template
+import subprocess
+import platform
+import sys
+import struct
+
+import serial.tools.list_ports
+
+
+PROTOCOL_TEXT = "text"
+PROTOCOL_BINARY = "binary"
+
+# Бинарные кадры (поля данных не превышают 180, поэтому стартовые байты
+# 0xFF, 0xFE и 0xFD однозначно начинают кадр):
+#   сервопривод: [0xFF, сервопривод, угол, скорость, контрольная сумма]
+#   поза:        [0xFE, число сервоприводов, углы..., скорости..., контрольная сумма]
+#   номер:       [0xFD, номер команды, контрольная сумма] — плата ответит "A<номер>"
+FRAME_SERVO = 0xFF
+FRAME_POSE = 0xFE
+FRAME_SEQUENCE = 0xFD
+# Номера команд в режиме подтверждения идут по кругу 0..127
+SEQUENCE_MODULO = 128
+
+BAUD_RATES = [9600, 19200, 38400, 57600, 115200, 230400, 250000, 500000, 1000000]
+DEFAULT_BAUDRATE = 9600
+MAX_BAUDRATE = 115200
+
+# Адрес виртуальной платы из ServoSimulator, параметры передаются в URL
+SIMULATOR_URL = "sim://"
+
+ServoCommand = namedtuple("ServoCommand", ["servo", "angle", "speed"])
+PoseCommand = namedtuple("PoseCommand", ["angles", "speeds"])
+
+FIRMWARE_FQBN = "arduino:avr:nano:cpu=atmega168"
+# Профили устройств: каналы сервоприводов и плата в JSON-файлах <имя>.json
+PROFILES_DIR = os.path.join("media", "profiles")
+# Библиотека Servo на AVR управляет не более чем 48 каналами (Arduino Mega)
+MAX_SERVO_COUNT = 48
+
+# Канал сервопривода: вывод платы (число или имя вроде "A0"), пределы угла,
+# положение после включения и поправка калибровки в градусах
+Channel = namedtuple("Channel", ["name", "pin", "min_angle", "max_angle", "home", "offset"])
+
+
+class DeviceProfile:
+    """
+    Описание устройства, по которому строятся ползунки окна, кадры протокола и скетч прошивки.
+
+    Углы в командах и последовательностях — логические: прошивка ограничивает
+    их пределами канала и прибавляет поправку калибровки offset только при
+    записи в сервопривод. Поэтому последовательность, записанная на одном
+    экземпляре устройства, подходит и другому с тем же профилем.
+    arm_kinematics включает декартово управление: первые три канала — колонна
+    и плечи руки ArmModel.
+
+    Формат JSON:
+        {"title": "...", "fqbn": "arduino:avr:uno", "arm_kinematics": false,
+         "channels": [{"name": "...", "pin": 4, "min": 0, "max": 180, "home": 90, "offset": 0}, ...]}
+    """
+
+    def __init__(self, name, title, channels, fqbn=FIRMWARE_FQBN, arm_kinematics=False):
+        channels = tuple(channels)
+        if not 0 < len(channels) <= MAX_SERVO_COUNT:
+            raise ValueError(f"Профиль {name}: число каналов должно быть от 1 до {MAX_SERVO_COUNT}")
+        for channel in channels:
+            if not 0 <= channel.min_angle <= channel.home <= channel.max_angle <= 180:
+                raise ValueError(f"Профиль {name}, канал «{channel.name}»: нужно 0 ≤ min ≤ home ≤ max ≤ 180")
+            pin = channel.pin
+            if not (isinstance(pin, int) and pin >= 0 or isinstance(pin, str) and pin[:1] == "A" and pin[1:].isdigit()):
+                raise ValueError(f"Профиль {name}, канал «{channel.name}»: неверный вывод {pin!r}")
+            if not -180 <= channel.offset <= 180:
+                raise ValueError(f"Профиль {name}, канал «{channel.name}»: поправка вне диапазона ±180°")
+        if len({str(channel.pin) for channel in channels}) != len(channels):
+            raise ValueError(f"Профиль {name}: выводы каналов повторяются")
+        self.name = name
+        self.title = title
+        self.channels = channels
+        self.fqbn = fqbn
+        self.arm_kinematics = arm_kinematics
+
+    @property
+    def servo_count(self):
+        return len(self.channels)
+
+    @property
+    def homes(self):
+        return [channel.home for channel in self.channels]
+
+    def clamp(self, angles):
+        """
+        Ограничивает углы пределами каналов, как это делает прошивка.
+        """
+        return [max(channel.min_angle, min(channel.max_angle, angle))
+                for channel, angle in zip(self.channels, angles)]
+
+    @classmethod
+    def generic(cls, servo_count):
+        """
+        Профиль без имён и пределов: каналы на выводах 2, 3, 4...
+        """
+        return cls(f"servos{servo_count}", f"{servo_count} сервоприводов",
+                   [Channel(f"Сервопривод {i + 1}", i + 2, 0, 180, 90, 0) for i in range(servo_count)])
+
+    def to_dict(self):
+        return {
+            "title": self.title,
+            "fqbn": self.fqbn,
+            "arm_kinematics": self.arm_kinematics,
+            "channels": [{"name": channel.name, "pin": channel.pin, "min": channel.min_angle,
+                          "max": channel.max_angle, "home": channel.home, "offset": channel.offset}
+                         for channel in self.channels],
+        }
+
+    @classmethod
+    def from_dict(cls, data, name):
+        try:
+            channels = []
+            for item in data["channels"]:
+                low, high = int(item.get("min", 0)), int(item.get("max", 180))
+                channels.append(Channel(str(item["name"]), item["pin"], low, high,
+                                        int(item.get("home", max(low, min(high, 90)))), int(item.get("offset", 0))))
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Профиль {name}: неверное описание каналов ({e})") from None
+        return cls(name, data.get("title", name), channels, data.get("fqbn", FIRMWARE_FQBN),
+                   bool(data.get("arm_kinematics", False)))
+
+    @classmethod
+    def load(cls, name):
+        """
+        :param name: Имя профиля из PROFILES_DIR или путь к файлу .json.
+        :return: DeviceProfile; встроенный профиль DEFAULT_PROFILE доступен и без файла.
+        :raises ValueError: Если профиль не найден или описан с ошибками.
+        """
+        path = name if name.endswith(".json") else os.path.join(PROFILES_DIR, f"{name}.json")
+        if not os.path.exists(path):
+            if name == DEFAULT_PROFILE.name:
+                return DEFAULT_PROFILE
+            raise ValueError(f"Профиль не найден: {name}")
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f), os.path.splitext(os.path.basename(path))[0])
+
+    def save(self, directory=PROFILES_DIR):
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"{self.name}.json"), "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+    @staticmethod
+    def available(directory=PROFILES_DIR):
+        """
+        :return: Имена профилей: встроенный и все файлы из directory.
+        """
+        names = {DEFAULT_PROFILE.name}
+        if os.path.isdir(directory):
+            names.update(os.path.splitext(file)[0] for file in os.listdir(directory) if file.endswith(".json"))
+        return sorted(names)
+
+
+DEFAULT_PROFILE = DeviceProfile("arm4", "Рука, 4 сервопривода", [
+    Channel("Колонна", 4, 0, 180, 90, 0),
+    Channel("Левое плечо", 5, 0, 180, 90, 0),
+    Channel("Правое плечо", 6, 0, 180, 90, 0),
+    Channel("Захват", 7, 0, 180, 90, 0),
+], FIRMWARE_FQBN, arm_kinematics=True)
+
+arduino_template = Template("""\
+#include <Servo.h>
+
+#define BAUD_RATE $baudrate
+#define MAX_BAUD_RATE $max_baudrate
+#define SERVO_COUNT $servo_count
+#define FRAME_SERVO 0xFF
+#define FRAME_POSE 0xFE
+#define FRAME_SEQUENCE 0xFD
+#define SEQUENCE_FRAME_SIZE 3
+#define SERVO_FRAME_SIZE 5
+#define POSE_FRAME_SIZE (3 + 2 * SERVO_COUNT)
+#define LINE_SIZE (16 + 8 * SERVO_COUNT)
+// Поля текстовой команды: "servo,angle,speed" или 2 * SERVO_COUNT значений позы
+#define FIELD_COUNT (2 * SERVO_COUNT > 3 ? 2 * SERVO_COUNT : 3)
+#define TICK_MS 10
+
+// Профиль $profile: $names
+Servo servos[SERVO_COUNT];
+const byte pins[SERVO_COUNT] = {$pins};
+// Пределы угла, положение после включения и поправка калибровки каждого канала
+const byte minAngle[SERVO_COUNT] = {$min_angles};
+const byte maxAngle[SERVO_COUNT] = {$max_angles};
+const byte homeAngle[SERVO_COUNT] = {$homes};
+const int offsets[SERVO_COUNT] = {$offsets};
+
+// Углы хранятся в сотых долях градуса, скорость — в °/с (0 — без ограничения)
+long current[SERVO_COUNT];
+long target[SERVO_COUNT];
+int speed[SERVO_COUNT];
+unsigned long lastTick = 0;
+
+char line[LINE_SIZE];
+int lineLength = 0;
+byte frame[POSE_FRAME_SIZE];
+byte frameLength = 0;
+byte frameSize = 0;
+
+// Номер команды, которую нужно подтвердить после применения (-1 — не нужно)
+int pendingSeq = -1;
+
+// Запись логического угла (в сотых долях градуса) с поправкой калибровки
+void writeServo(byte i, long position) {
+  servos[i].write(constrain((int)((position + 50) / 100) + offsets[i], 0, 180));
+}
+
+void setup() {
+  Serial.begin(BAUD_RATE);
+  for (byte i = 0; i < SERVO_COUNT; i++) {
+    current[i] = (long)homeAngle[i] * 100;
+    target[i] = current[i];
+    speed[i] = 0;
+    // Угол задаётся до attach, чтобы при включении сервопривод не дёргался к 90°
+    writeServo(i, current[i]);
+    servos[i].attach(pins[i]);
+  }
+}
+
+void applyCommand(int servoNum, int angle, int servoSpeed) {
+  if (servoNum < 1 || servoNum > SERVO_COUNT) {
+    return;
+  }
+  byte i = servoNum - 1;
+  target[i] = (long)constrain(angle, minAngle[i], maxAngle[i]) * 100;
+  speed[i] = servoSpeed;
+  if (servoSpeed == 0) {
+    current[i] = target[i];
+    writeServo(i, target[i]);
+  }
+}
+
+// Неблокирующий шаг движения: каждые TICK_MS миллисекунд текущие углы
+// приближаются к целевым не быстрее заданной скорости
+void updateMotion() {
+  unsigned long now = millis();
+  unsigned long elapsed = now - lastTick;
+  if (elapsed < TICK_MS) {
+    return;
+  }
+  lastTick = now;
+  for (byte i = 0; i < SERVO_COUNT; i++) {
+    if (current[i] == target[i]) {
+      continue;
+    }
+    long step = (long)speed[i] * elapsed / 10;
+    if (step < 1) {
+      step = 1;
+    }
+    if (current[i] < target[i]) {
+      current[i] = min(current[i] + step, target[i]);
+    } else {
+      current[i] = max(current[i] - step, target[i]);
+    }
+    writeServo(i, current[i]);
+  }
+}
+
+void acknowledge() {
+  if (pendingSeq >= 0) {
+    Serial.print("A");
+    Serial.println(pendingSeq);
+    pendingSeq = -1;
+  }
+}
+
+// Согласование скорости: "?" — запрос максимальной скорости платы,
+// "B<скорость>" — переход на новую скорость после ответа "OK"
+boolean parseHandshake() {
+  if (line[0] == '?') {
+    Serial.print("RC ");
+    Serial.println(MAX_BAUD_RATE);
+    return true;
+  }
+  if (line[0] == 'B') {
+    line[lineLength] = '\\0';
+    long rate = atol(line + 1);
+    if (rate > 0 && rate <= MAX_BAUD_RATE) {
+      Serial.println("OK");
+      Serial.flush();
+      Serial.end();
+      Serial.begin(rate);
+    }
+    return true;
+  }
+  return false;
+}
+
+// Текстовые команды разбираются без String и кучи:
+//   "servo,angle,speed"       — один сервопривод
+//   "P,a1,...,aN,s1,...,sN"   — поза всех сервоприводов
+//   "#seq"                    — номер следующей команды для подтверждения
+void parseLine() {
+  if (lineLength > 0 && parseHandshake()) {
+    return;
+  }
+  if (lineLength > 0 && line[0] == '#') {
+    line[lineLength] = '\\0';
+    pendingSeq = atoi(line + 1);
+    return;
+  }
+  int values[FIELD_COUNT] = {0};
+  boolean pose = lineLength > 0 && line[0] == 'P';
+  byte maxFields = pose ? 2 * SERVO_COUNT : 3;
+  byte field = 0;
+  for (int i = pose ? 2 : 0; i < lineLength && field < maxFields; i++) {
+    char c = line[i];
+    if (c == ',') {
+      field++;
+    } else if (c >= '0' && c <= '9') {
+      values[field] = values[field] * 10 + (c - '0');
+    }
+  }
+  if (pose) {
+    if (field == maxFields - 1) {
+      for (byte i = 0; i < SERVO_COUNT; i++) {
+        applyCommand(i + 1, values[i], values[SERVO_COUNT + i]);
+      }
+      acknowledge();
+    }
+  } else if (field >= 1) {
+    applyCommand(values[0], values[1], values[2]);
+    acknowledge();
+  }
+}
+
+void parseFrame() {
+  byte checksum = 0;
+  for (byte i = 1; i < frameSize - 1; i++) {
+    checksum += frame[i];
+  }
+  if ((checksum & 0x7F) != frame[frameSize - 1]) {
+    return;
+  }
+  if (frame[0] == FRAME_SEQUENCE) {
+    pendingSeq = frame[1];
+  } else if (frame[0] == FRAME_SERVO) {
+    applyCommand(frame[1], frame[2], frame[3]);
+    acknowledge();
+  } else if (frame[1] == SERVO_COUNT) {
+    for (byte i = 0; i < SERVO_COUNT; i++) {
+      applyCommand(i + 1, frame[2 + i], frame[2 + SERVO_COUNT + i]);
+    }
+    acknowledge();
+  }
+}
+
+void loop() {
+  while (Serial.available() > 0) {
+    byte c = Serial.read();
+    if (c == FRAME_SERVO || c == FRAME_POSE || c == FRAME_SEQUENCE) {
+      frame[0] = c;
+      frameLength = 1;
+      if (c == FRAME_SERVO) {
+        frameSize = SERVO_FRAME_SIZE;
+      } else if (c == FRAME_POSE) {
+        frameSize = POSE_FRAME_SIZE;
+      } else {
+        frameSize = SEQUENCE_FRAME_SIZE;
+      }
+    } else if (frameLength > 0) {
+      frame[frameLength++] = c;
+      if (frameLength == frameSize) {
+        parseFrame();
+        frameLength = 0;
+      }
+    } else if (c == '\\n') {
+      parseLine();
+      lineLength = 0;
+    } else if (lineLength < LINE_SIZE - 1) {
+      line[lineLength++] = c;
+    }
+  }
+  updateMotion();
+}
+""")
+
+
+def build_firmware(baudrate=DEFAULT_BAUDRATE, max_baudrate=MAX_BAUDRATE, profile=None):
+    """
+    Формирует текст прошивки с заданными параметрами.
+
+    :param baudrate: Скорость COM-порта, с которой плата стартует.
+    :param max_baudrate: Максимальная скорость, которую плата примет при согласовании.
+    :param profile: DeviceProfile с каналами (по умолчанию DEFAULT_PROFILE).
+    :return: Исходный код скетча.
+    """
+    if profile is None:
+        profile = DEFAULT_PROFILE
+    channels = profile.channels
+
+    def values(field):
+        return ", ".join(str(getattr(channel, field)) for channel in channels)
+
+    return arduino_template.substitute(
+        baudrate=baudrate, max_baudrate=max(baudrate, max_baudrate), servo_count=len(channels),
+        profile=profile.name, names=", ".join(" ".join(channel.name.split()) for channel in channels),
+        pins=values("pin"), min_angles=values("min_angle"), max_angles=values("max_angle"),
+        homes=values("home"), offsets=values("offset"))
+
+
+def negotiate_baudrate(ser, max_baudrate=BAUD_RATES[-1], attempts=15):
+    """
+    Согласует с платой наибольшую скорость, поддерживаемую обеими сторонами.
+
+    Открытие порта перезагружает плату, поэтому запрос повторяется, пока
+    загрузчик не передаст управление прошивке.
+
+    :param ser: Открытый COM-порт.
+    :param max_baudrate: Максимальная скорость со стороны компьютера.
+    :param attempts: Число запросов с интервалом ~0.2 с.
+    :return: Установленная скорость или None, если плата не ответила.
+    """
+    timeout = ser.timeout
+    ser.timeout = 0.2
+    try:
+        device_max = None
+        for _ in range(attempts):
+            ser.write(b"?\n")
+            reply = ser.readline().decode("ascii", "ignore").strip()
+            if reply.startswith("RC "):
+                device_max = int(reply[3:])
+                break
+        if device_max is None:
+            return None
+        rate = max(rate for rate in BAUD_RATES if rate <= min(device_max, max_baudrate))
+        if rate == ser.baudrate:
+            return rate
+        ser.write(f"B{rate}\n".encode("ascii"))
+        if ser.readline().strip() != b"OK":
+            return None
+        ser.baudrate = rate
+        ser.reset_input_buffer()
+        return rate
+    finally:
+        ser.timeout = timeout
+
+
+def open_serial(port, baudrate=DEFAULT_BAUDRATE, timeout=1):
+    """
+    Открывает COM-порт, URL pyserial (например, loop://) или виртуальную плату sim://.
+    """
+    if port.startswith(SIMULATOR_URL):
+        # Симулятор сам импортирует ServoCore, поэтому подключается только по требованию
+        from ServoSimulator import SimulatedSerial
+        return SimulatedSerial(port, baudrate, timeout=timeout)
+    return serial.serial_for_url(port, baudrate, timeout=timeout)
+
+
+def encode_command(protocol, command):
+    """
+    Кодирует команду для передачи по COM-порту.
+
+    :param protocol: PROTOCOL_TEXT или PROTOCOL_BINARY.
+    :param command: ServoCommand или PoseCommand.
+    :return: Байты команды.
+    """
+    fields = (*command.angles, *command.speeds) if isinstance(command, PoseCommand) else command
+    assert all(0 <= value <= 180 for value in fields), f"поля данных должны быть от 0 до 180: {command}"
+    if isinstance(command, PoseCommand):
+        if protocol == PROTOCOL_BINARY:
+            body = bytes((len(command.angles), *command.angles, *command.speeds))
+            return bytes((FRAME_POSE,)) + body + bytes((sum(body) & 0x7F,))
+        fields = ",".join(str(value) for value in (*command.angles, *command.speeds))
+        return f"P,{fields}\n".encode("ascii")
+    if protocol == PROTOCOL_BINARY:
+        checksum = sum(command) & 0x7F
+        return bytes((FRAME_SERVO, *command, checksum))
+    return f"{command.servo},{command.angle},{command.speed}\n".encode("ascii")
+
+
+def encode_sequence(protocol, seq):
+    """
+    Кодирует номер следующей команды, которую плата должна подтвердить.
+    """
+    if protocol == PROTOCOL_BINARY:
+        return bytes((FRAME_SEQUENCE, seq, seq & 0x7F))
+    return f"#{seq}\n".encode("ascii")
+
+
+# Ключ команды позы в очереди: поза задаёт все сервоприводы сразу
+POSE_KEY = "pose"
+
+
+def command_key(command):
+    """
+    Ключ команды в очереди: номер сервопривода или POSE_KEY для целой позы.
+    """
+    return POSE_KEY if isinstance(command, PoseCommand) else command.servo
+
+
+class CoalescingCommandQueue:
+    """
+    Очередь команд по принципу «последнее значение побеждает».
+
+    Команды хранятся по ключу (номер сервопривода). Новая команда для ключа,
+    который ещё ждёт отправки, заменяет старую и сохраняет её место в очереди.
+    Поза (POSE_KEY) заменяет и все ожидающие команды отдельных сервоприводов,
+    поэтому команда сервопривода в очереди всегда стоит после позы и не
+    перекрывается более старой позой.
+    Размер очереди ограничен maxlen: при переполнении отбрасывается самая
+    старая команда. Добавление и извлечение выполняются за O(1).
+    """
+
+    def __init__(self, maxlen=64):
+        self.maxlen = maxlen
+        self.superseded = 0
+        self.dropped = 0
+        self._pending = OrderedDict()
+        self._condition = threading.Condition()
+        self._closed = False
+
+    def __len__(self):
+        with self._condition:
+            return len(self._pending)
+
+    def put(self, key, command):
+        with self._condition:
+            if key == POSE_KEY:
+                for other in [other for other in self._pending if other != POSE_KEY]:
+                    del self._pending[other]
+                    self.superseded += 1
+            if key in self._pending:
+                self.superseded += 1
+            elif len(self._pending) >= self.maxlen:
+                self._pending.popitem(last=False)
+                self.dropped += 1
+            self._pending[key] = (command, time.perf_counter())
+            self._condition.notify()
+
+    def get(self, timeout=None):
+        """
+        Извлекает самую старую команду, ожидая её появления.
+
+        :param timeout: Максимальное время ожидания в секундах (None — без ограничения).
+        :return: Команда или None, если очередь закрыта или время ожидания истекло.
+        """
+        return self.get_timed(timeout)[0]
+
+    def get_timed(self, timeout=None):
+        """
+        То же, что get, но дополнительно возвращает время ожидания команды в очереди.
+
+        :return: Пара (команда, секунды в очереди) или (None, 0.0).
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._pending or self._closed, timeout):
+                return None, 0.0
+            if self._closed:
+                return None, 0.0
+            command, enqueued_at = self._pending.popitem(last=False)[1]
+            return command, time.perf_counter() - enqueued_at
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def clear(self):
+        with self._condition:
+            self._pending.clear()
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+class AckWindow:
+    """
+    Скользящее окно команд, ожидающих подтверждения от платы.
+
+    Одновременно в пути не больше size команд, что защищает 64-байтный
+    приёмный буфер платы от переполнения. Команда без подтверждения дольше
+    timeout отправляется повторно, после max_retries повторов считается
+    потерянной. Команда, которую уже заменила более новая команда с тем же
+    ключом, повторно не отправляется; поза и команды отдельных сервоприводов
+    заменяют друг друга, поэтому повтор не вернёт сервопривод к старому углу.
+    """
+
+    def __init__(self, size=4, timeout=0.2, max_retries=3):
+        self.size = size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.sent = 0
+        self.acked = 0
+        self.retries = 0
+        self.lost = 0
+        self.latencies = deque(maxlen=256)
+        self._in_flight = OrderedDict()
+        # Порядковый номер последней отправки для каждого ключа; номера команд
+        # идут по кругу, поэтому порядок отправки считается отдельно
+        self._latest = {}
+        self._order = 0
+        self._next_seq = 0
+        self._condition = threading.Condition()
+
+    def __len__(self):
+        with self._condition:
+            return len(self._in_flight)
+
+    def wait_for_slot(self, timeout):
+        with self._condition:
+            return self._condition.wait_for(lambda: len(self._in_flight) < self.size, timeout)
+
+    def register(self, command):
+        """
+        Добавляет команду в окно.
+
+        :return: Присвоенный команде номер.
+        """
+        with self._condition:
+            seq = self._next_seq
+            self._next_seq = (seq + 1) % SEQUENCE_MODULO
+            now = time.perf_counter()
+            self._order += 1
+            self._in_flight[seq] = [command, now, now, 0, self._order]
+            self._latest[command_key(command)] = self._order
+            self.sent += 1
+            return seq
+
+    def acknowledge(self, seq):
+        with self._condition:
+            entry = self._in_flight.pop(seq, None)
+            if entry:
+                self.acked += 1
+                self.latencies.append(time.perf_counter() - entry[1])
+                self._condition.notify_all()
+
+    def expired(self):
+        """
+        Выбирает команды для повторной отправки и отбрасывает потерянные.
+
+        :return: Список пар (номер, команда).
+        """
+        resend = []
+        now = time.perf_counter()
+        with self._condition:
+            for seq, entry in list(self._in_flight.items()):
+                command, _, last_sent, retries, order = entry
+                if now - last_sent < self.timeout:
+                    continue
+                if self.superseded(command, order):
+                    del self._in_flight[seq]
+                elif retries >= self.max_retries:
+                    del self._in_flight[seq]
+                    self.lost += 1
+                else:
+                    entry[2] = now
+                    entry[3] += 1
+                    self.retries += 1
+                    resend.append((seq, command))
+            self._condition.notify_all()
+        return resend
+
+    def superseded(self, command, order):
+        """
+        Проверяет, отправлена ли после команды более новая команда для тех же сервоприводов.
+        """
+        key = command_key(command)
+        if self._latest.get(key) != order:
+            return True
+        if key == POSE_KEY:
+            return any(latest > order for other, latest in self._latest.items() if other != POSE_KEY)
+        return self._latest.get(POSE_KEY, 0) > order
+
+    def stats(self):
+        """
+        Сводка для диагностики: счётчики и задержка подтверждения в мс.
+        """
+        with self._condition:
+            latencies = list(self.latencies)
+        return {
+            "sent": self.sent,
+            "acked": self.acked,
+            "retries": self.retries,
+            "lost": self.lost,
+            "in_flight": len(self),
+            "latency_avg_ms": 1000 * sum(latencies) / len(latencies) if latencies else 0.0,
+            "latency_max_ms": 1000 * max(latencies) if latencies else 0.0,
+        }
+
+
+class SerialTelemetry:
+    """
+    Метрики канала связи, накапливаемые в кольцевых буферах фиксированного размера.
+
+    На каждую отправленную команду сохраняются время, размер, длительность
+    записи в порт, время ожидания в очереди и глубина очереди. Потребление
+    памяти не растёт со временем работы.
+    """
+
+    CSV_FIELDS = ["time", "bytes", "write_ms", "queue_wait_ms", "queue_depth"]
+
+    def __init__(self, size=2048):
+        self.size = size
+        self.enqueued = 0
+        self.written = 0
+        self.bytes_written = 0
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._reset_buffers()
+
+    def _reset_buffers(self):
+        self.times = deque(maxlen=self.size)
+        self.sizes = deque(maxlen=self.size)
+        self.write_latencies = deque(maxlen=self.size)
+        self.queue_waits = deque(maxlen=self.size)
+        self.queue_depths = deque(maxlen=self.size)
+
+    def reset(self):
+        with self._lock:
+            self.enqueued = 0
+            self.written = 0
+            self.bytes_written = 0
+            self.started = time.perf_counter()
+            self._reset_buffers()
+
+    def record_enqueue(self):
+        with self._lock:
+            self.enqueued += 1
+
+    def record_write(self, size, write_latency, queue_wait, queue_depth):
+        with self._lock:
+            self.written += 1
+            self.bytes_written += size
+            self.times.append(time.perf_counter() - self.started)
+            self.sizes.append(size)
+            self.write_latencies.append(write_latency)
+            self.queue_waits.append(queue_wait)
+            self.queue_depths.append(queue_depth)
+
+    def samples(self):
+        with self._lock:
+            return list(zip(self.times, self.sizes, self.write_latencies, self.queue_waits, self.queue_depths))
+
+    def snapshot(self, window=1.0):
+        """
+        Сводка метрик; скорости считаются по последним window секундам.
+        """
+        now = time.perf_counter() - self.started
+        recent = [sample for sample in self.samples() if sample[0] >= now - window]
+        latencies = [sample[2] for sample in recent]
+        waits = [sample[3] for sample in recent]
+        return {
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "bytes_written": self.bytes_written,
+            "commands_per_second": len(recent) / window,
+            "bytes_per_second": sum(sample[1] for sample in recent) / window,
+            "queue_depth": recent[-1][4] if recent else 0,
+            "write_avg_ms": 1000 * sum(latencies) / len(latencies) if latencies else 0.0,
+            "write_max_ms": 1000 * max(latencies) if latencies else 0.0,
+            "queue_wait_avg_ms": 1000 * sum(waits) / len(waits) if waits else 0.0,
+            "queue_wait_max_ms": 1000 * max(waits) if waits else 0.0,
+        }
+
+    def export_csv(self, file_path):
+        with open(file_path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(self.CSV_FIELDS)
+            for t, size, latency, wait, depth in self.samples():
+                writer.writerow([f"{t:.6f}", size, f"{1000 * latency:.3f}", f"{1000 * wait:.3f}", depth])
+
+    def export_json(self, file_path, extra=None):
+        data = {
+            "summary": dict(self.snapshot(), **(extra or {})),
+            "samples": [dict(zip(self.CSV_FIELDS, (t, size, 1000 * latency, 1000 * wait, depth)))
+                        for t, size, latency, wait, depth in self.samples()],
+        }
+        with open(file_path, "w") as f:
+            json.dump(data, f, indent=2)
+
+
+class SerialWriter(threading.Thread):
+    """
+    Фоновый поток записи в COM-порт.
+
+    Поток владеет объектом порта и блокируется на очереди команд. Запись идёт
+    темпом канала: следующая команда берётся из очереди, только когда
+    предыдущие почти переданы (оценка по числу байтов и скорости порта).
+    Иначе команды уходили бы в буфер драйвера, где их уже не заменить новыми,
+    и при медленном канале рука двигалась бы ещё секунды после ползунка.
+    Ошибки записи передаются в GUI через функцию обратного вызова (обычно это
+    emit сигнала).
+    """
+
+    # Время загрузчика Arduino после сброса при открытии порта (DTR), с
+    BOOT_DELAY = 2.0
+
+    # Запас времени передачи (с), при котором поток уже берёт следующую команду,
+    # чтобы канал не простаивал между командами
+    LINK_SLACK = 0.002
+
+    def __init__(self, ser, command_queue, on_error=None, protocol=PROTOCOL_TEXT,
+                 negotiate=False, on_baudrate=None, ack_window=None, telemetry=None, boot_delay=0.0):
+        super().__init__(daemon=True)
+        self.ser = ser
+        self.command_queue = command_queue
+        self.on_error = on_error
+        self.protocol = protocol
+        self.negotiate = negotiate
+        self.on_baudrate = on_baudrate
+        self.ack_window = ack_window
+        self.telemetry = telemetry
+        # Момент, к которому будут переданы все записанные в порт байты
+        self.link_busy_until = 0.0
+        # Плата готова принимать команды: загрузчик завершился, скорость согласована.
+        # До этого команды копятся (и заменяют друг друга) в очереди
+        self.boot_until = time.perf_counter() + boot_delay
+        self.ready = threading.Event()
+
+    def run(self):
+        while not self.command_queue.closed and time.perf_counter() < self.boot_until:
+            time.sleep(min(0.05, max(0.0, self.boot_until - time.perf_counter())))
+        if self.negotiate:
+            try:
+                rate = negotiate_baudrate(self.ser)
+            except Exception as e:
+                rate = None
+                if self.on_error:
+                    self.on_error(str(e))
+            if self.on_baudrate:
+                self.on_baudrate(rate or 0)
+        self.ready.set()
+        if self.ack_window is not None:
+            threading.Thread(target=self.read_acks, daemon=True).start()
+            self.write_windowed()
+            return
+        while self.wait_for_link():
+            command, wait = self.command_queue.get_timed()
+            if command is None:
+                break
+            self.write(command, queue_wait=wait)
+
+    def wait_for_link(self):
+        """
+        Ждёт, пока переданы почти все записанные байты; тем временем новые
+        команды заменяют ожидающие в очереди.
+
+        :return: False, если очередь закрыта.
+        """
+        while not self.command_queue.closed:
+            remaining = self.link_busy_until - time.perf_counter() - self.LINK_SLACK
+            if remaining <= 0:
+                return True
+            time.sleep(min(remaining, 0.05))
+        return False
+
+    def write(self, command, seq=None, queue_wait=0.0):
+        try:
+            data = encode_command(self.protocol, command)
+            if seq is not None:
+                data = encode_sequence(self.protocol, seq) + data
+            started = time.perf_counter()
+            self.ser.write(data)
+            self.link_busy_until = (max(self.link_busy_until, started)
+                                    + len(data) * 10 / (self.ser.baudrate or DEFAULT_BAUDRATE))
+            if self.telemetry:
+                self.telemetry.record_write(len(data), time.perf_counter() - started,
+                                            queue_wait, len(self.command_queue))
+        except Exception as e:
+            if self.on_error:
+                self.on_error(str(e))
+
+    def write_windowed(self):
+        window = self.ack_window
+        while self.wait_for_link():
+            for seq, command in window.expired():
+                self.write(command, seq)
+            if not window.wait_for_slot(window.timeout):
+                continue
+            command, wait = self.command_queue.get_timed(window.timeout)
+            if command is not None:
+                self.write(command, window.register(command), wait)
+
+    def read_acks(self):
+        while self.ser.is_open and not self.command_queue.closed:
+            try:
+                reply = self.ser.readline()
+            except Exception:
+                break
+            if reply.startswith(b"A") and reply[1:].strip().isdigit():
+                self.ack_window.acknowledge(int(reply[1:]))
+
+    def stop(self):
+        """
+        Останавливает поток и закрывает порт.
+        """
+        self.command_queue.close()
+        self.join(timeout=2)
+        if self.ser.is_open:
+            self.ser.close()
+
+
+# Ускорение сервоприводов при плавном движении, °/с²
+DEFAULT_ACCELERATION = 200.0
+# Частота обновления ШИМ сервопривода: чаще 50 Гц уставки слать бессмысленно
+MAX_CONTROL_RATE = 50.0
+# Запас перед общим стартом воспроизведения на нескольких платах, с
+SYNC_START_MARGIN = 0.01
+# Доля пропускной способности канала, отдаваемая потоку уставок
+LINK_UTILIZATION = 0.7
+
+
+def link_control_rate(baudrate, frame_size, max_rate=MAX_CONTROL_RATE):
+    """
+    Подбирает частоту отправки уставок под пропускную способность канала.
+
+    :param baudrate: Скорость COM-порта в бодах (10 бит на байт).
+    :param frame_size: Размер одной команды позы в байтах.
+    :return: Частота уставок в Гц.
+    """
+    frames_per_second = LINK_UTILIZATION * baudrate / 10 / frame_size
+    return max(1.0, min(max_rate, frames_per_second))
+
+
+class MotionPlanner:
+    """
+    Онлайн-планировщик движения с трапецеидальным профилем скорости.
+
+    Каждое сочленение разгоняется с ограниченным ускорением до своей скорости
+    и тормозит так, чтобы остановиться точно в цели. Пределы скорости и
+    ускорения всех сочленений масштабируются по самому медленному из них,
+    поэтому все сочленения приходят в цель одновременно. Цель можно менять
+    во время движения: профиль продолжится от текущих положения и скорости.
+    Скорость 0, как и в прошивке, означает движение без ограничения: такое
+    сочленение сразу переходит в цель.
+    """
+
+    def __init__(self, angles, acceleration=DEFAULT_ACCELERATION):
+        self.acceleration = acceleration
+        self.positions = [float(angle) for angle in angles]
+        self.velocities = [0.0] * len(angles)
+        self.targets = list(self.positions)
+        self.speed_limits = [0.0] * len(angles)
+        self.accel_limits = [acceleration] * len(angles)
+        # Сочленения перешли в цель скачком, и эту уставку ещё нужно отправить
+        self.jumped = False
+
+    @property
+    def moving(self):
+        return self.jumped or any(self.velocities) or self.positions != self.targets
+
+    def set_target(self, angles, speeds):
+        self.targets = [float(angle) for angle in angles]
+        for i, speed in enumerate(speeds):
+            if speed <= 0 and (self.positions[i] != self.targets[i] or self.velocities[i]):
+                self.positions[i] = self.targets[i]
+                self.velocities[i] = 0.0
+                self.jumped = True
+        limited = [i for i, speed in enumerate(speeds) if speed > 0]
+        distances = [abs(target - position) for target, position in zip(self.targets, self.positions)]
+        if not limited:
+            return
+        slowest = max(limited, key=lambda i: distances[i] / speeds[i])
+        if distances[slowest] == 0:
+            return
+        for i in limited:
+            # Доля пути относительно самого медленного сочленения; нижняя граница
+            # оставляет сочленению возможность затормозить после смены цели
+            ratio = max(distances[i] / distances[slowest], 0.05)
+            self.speed_limits[i] = ratio * speeds[slowest]
+            self.accel_limits[i] = ratio * self.acceleration
+
+    def step(self, dt):
+        """
+        Продвигает все сочленения на интервал dt.
+
+        :param dt: Шаг по времени в секундах.
+        :return: Новая уставка — список целых углов.
+        """
+        self.jumped = False
+        for i, target in enumerate(self.targets):
+            error = target - self.positions[i]
+            accel_step = self.accel_limits[i] * dt
+            braking_speed = (2 * self.accel_limits[i] * abs(error)) ** 0.5
+            desired = min(self.speed_limits[i], braking_speed)
+            desired = desired if error > 0 else -desired
+            velocity = self.velocities[i]
+            velocity += max(-accel_step, min(accel_step, desired - velocity))
+            position = self.positions[i] + velocity * dt
+            if abs(error) < 0.5 or (target - position) * error < 0:
+                position, velocity = target, 0.0
+            self.positions[i] = position
+            self.velocities[i] = velocity
+        return [round(position) for position in self.positions]
+
+
+class MotionStreamer(threading.Thread):
+    """
+    Поток, отправляющий промежуточные уставки MotionPlanner с постоянной частотой.
+
+    Пока цель не задана или достигнута, поток спит. Частота берётся из функции
+    rate_source при каждом такте и подстраивается под скорость канала.
+    """
+
+    def __init__(self, planner, send_pose, rate_source):
+        super().__init__(daemon=True)
+        self.planner = planner
+        self.send_pose = send_pose
+        self.rate_source = rate_source
+        # Уставки уже сглажены на стороне компьютера, поэтому плата должна
+        # применять их сразу: скорость 0 отключает интерполяцию в прошивке
+        self.speeds = (0,) * len(planner.positions)
+        self._condition = threading.Condition()
+        self._stopped = False
+
+    def move_to(self, angles, speeds):
+        with self._condition:
+            self.planner.set_target(angles, speeds)
+            self._condition.notify()
+
+    def run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._stopped or self.planner.moving)
+                if self._stopped:
+                    return
+            deadline = time.perf_counter()
+            while True:
+                period = 1 / self.rate_source()
+                with self._condition:
+                    if self._stopped or not self.planner.moving:
+                        break
+                    pose = self.planner.step(period)
+                self.send_pose(pose, self.speeds)
+                deadline += period
+                with self._condition:
+                    self._condition.wait_for(lambda: self._stopped, max(0.0, deadline - time.perf_counter()))
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        self.join(timeout=1)
+
+
+class SequencePlayer(threading.Thread):
+    """
+    Проигрыватель последовательности поз вне потока GUI.
+
+    Моменты отправки поз считаются от времени старта как сумма задержек шагов,
+    поэтому ошибка не накапливается на длинных последовательностях. Большую
+    часть интервала поток спит на условной переменной, последние миллисекунды
+    дожидается активным ожиданием, чтобы не зависеть от разрешения таймера ОС.
+    """
+
+    # Остаток интервала (в секундах), который выдерживается активным ожиданием
+    SPIN_THRESHOLD = 0.002
+
+    def __init__(self, poses, default_delay, send_pose, loop=False, on_step=None, on_finished=None,
+                 wait_ready=None):
+        super().__init__(daemon=True)
+        self.poses = poses
+        # wait_ready(отменено) блокирует до готовности плат и возвращает момент старта
+        self.wait_ready = wait_ready
+        self.default_delay = default_delay
+        self.send_pose = send_pose
+        self.loop = loop
+        self.on_step = on_step
+        self.on_finished = on_finished
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._paused_at = None
+        self._pause_offset = 0.0
+        self.done = False
+
+    def run(self):
+        try:
+            deadline = time.perf_counter()
+            if self.wait_ready is not None:
+                deadline = self.wait_ready(lambda: self._stopped)
+                if deadline is None:
+                    return
+            while self.poses:
+                for index, pose in enumerate(self.poses):
+                    if not self._wait_until(deadline):
+                        return
+                    self.send_pose(pose.angles, pose.speeds)
+                    if self.on_step:
+                        self.on_step(index)
+                    deadline += (self.default_delay if pose.delay is None else pose.delay) / 1000
+                if not self.loop:
+                    break
+        finally:
+            self.done = True
+            if self.on_finished:
+                self.on_finished()
+
+    def _wait_until(self, deadline):
+        """
+        Ждёт наступления момента deadline с учётом времени, проведённого на паузе.
+
+        :return: False, если воспроизведение остановлено.
+        """
+        with self._condition:
+            while not self._stopped:
+                if self._paused_at is not None:
+                    self._condition.wait()
+                    continue
+                remaining = deadline + self._pause_offset - time.perf_counter()
+                if remaining <= self.SPIN_THRESHOLD:
+                    break
+                self._condition.wait(remaining - self.SPIN_THRESHOLD)
+            if self._stopped:
+                return False
+            deadline += self._pause_offset
+        while time.perf_counter() < deadline:
+            pass
+        return True
+
+    @property
+    def paused(self):
+        return self._paused_at is not None
+
+    def pause(self):
+        with self._condition:
+            if self._paused_at is None:
+                self._paused_at = time.perf_counter()
+
+    def resume(self):
+        with self._condition:
+            if self._paused_at is not None:
+                self._pause_offset += time.perf_counter() - self._paused_at
+                self._paused_at = None
+                self._condition.notify_all()
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+
+class BoardIdentifier:
+    """
+    Кэш опознавания плат по VID/PID и серийному номеру USB-устройства.
+
+    Плата опознаётся по списку известных производителей USB-мостов Arduino
+    без запуска arduino-cli. Результат запоминается для устройства и
+    переживает переподключение под другим именем порта.
+    """
+
+    # Arduino, Arduino.org, CH340, FTDI, CP210x
+    ARDUINO_VIDS = {0x2341, 0x2A03, 0x1A86, 0x0403, 0x10C4}
+
+    def __init__(self):
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(port_info):
+        return port_info.vid, port_info.pid, port_info.serial_number
+
+    def is_arduino(self, port_info):
+        if port_info.vid is None:
+            return False
+        key = self.key(port_info)
+        with self._lock:
+            if key not in self._cache:
+                self._cache[key] = port_info.vid in self.ARDUINO_VIDS
+            return self._cache[key]
+
+    def remember(self, port_info, is_arduino):
+        with self._lock:
+            self._cache[self.key(port_info)] = is_arduino
+
+
+class PortWatcher(threading.Thread):
+    """
+    Фоновое отслеживание COM-портов.
+
+    Поток периодически опрашивает список портов и вызывает
+    on_change(порты, добавленные, удалённые) только когда список изменился,
+    поэтому GUI не блокируется на сканировании. refresh() запускает опрос
+    немедленно.
+    """
+
+    def __init__(self, on_change, interval=1.0):
+        super().__init__(daemon=True)
+        self.on_change = on_change
+        self.interval = interval
+        self._ports = {}
+        self._scanned = False
+        self._wakeup = threading.Event()
+        self._stopped = False
+
+    def run(self):
+        while not self._stopped:
+            try:
+                ports = {port.device: port for port in serial.tools.list_ports.comports()}
+            except Exception:
+                ports = self._ports
+            added = [ports[device] for device in ports if device not in self._ports]
+            removed = [self._ports[device] for device in self._ports if device not in ports]
+            if added or removed or not self._scanned:
+                self._ports = ports
+                self._scanned = True
+                self.on_change(sorted(ports.values(), key=lambda port: port.device), added, removed)
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+    def refresh(self):
+        self._wakeup.set()
+
+    def stop(self):
+        self._stopped = True
+        self._wakeup.set()
+
+
+COMMANDS_DIR = os.path.join("media", "commands")
+
+
+Pose = namedtuple("Pose", ["angles", "speeds", "delay"])
+
+
+class PoseSequence:
+    """
+    Последовательность поз, хранящаяся в типизированных массивах array.
+
+    Углы и скорости каждого сервопривода лежат в отдельном массиве байтов,
+    задержки — в массиве uint16 (NO_DELAY — задержка не задана). Поза
+    занимает 2N + 2 байта вместо словаря со списками. Добавление в конец —
+    амортизированное O(1); вставка и удаление сдвигают массивы целиком
+    средствами C (memmove), без создания объектов Python. Преобразования
+    всей последовательности выполняются поколоночно через bytes.translate.
+    """
+
+    NO_DELAY = 0xFFFF
+
+    def __init__(self, servo_count=4):
+        self.servo_count = servo_count
+        self.angles = [array("B") for _ in range(servo_count)]
+        self.speeds = [array("B") for _ in range(servo_count)]
+        self.delays = array("H")
+
+    @classmethod
+    def from_poses(cls, poses, servo_count=4):
+        """
+        Создаёт последовательность из поз или словарей старого формата
+        {"angles": [...], "speeds": [...], "delay": ...}.
+
+        :raises ValueError: Если записи имеют неверную форму или значения вне диапазона
+            (углы и скорости 0–180, задержка 0–65534 мс).
+        """
+        if not isinstance(poses, (list, tuple, PoseSequence)):
+            raise ValueError("ожидается список поз")
+        sequence = None
+        for number, pose in enumerate(poses, 1):
+            if isinstance(pose, dict):
+                try:
+                    pose = Pose(pose["angles"], pose["speeds"], pose.get("delay"))
+                except KeyError as e:
+                    raise ValueError(f"поза {number}: нет поля {e}") from None
+            elif not isinstance(pose, Pose):
+                raise ValueError(f"поза {number}: ожидается объект с полями angles и speeds")
+            count = len(pose.angles) if sequence is None else sequence.servo_count
+            cls._check_pose(number, pose, count)
+            if sequence is None:
+                sequence = cls(count)
+            sequence.append(pose.angles, pose.speeds, pose.delay)
+        return sequence if sequence is not None else cls(servo_count)
+
+    @staticmethod
+    def _check_pose(number, pose, servo_count):
+        for name, values in (("angles", pose.angles), ("speeds", pose.speeds)):
+            if not isinstance(values, (list, tuple)) or not values or len(values) != servo_count:
+                raise ValueError(f"поза {number}: в {name} должно быть {servo_count or 'больше 0'} значений")
+            if not all(type(value) is int and 0 <= value <= 180 for value in values):
+                raise ValueError(f"поза {number}: значения {name} должны быть целыми от 0 до 180")
+        delay = pose.delay
+        if delay is not None and not (type(delay) is int and 0 <= delay < PoseSequence.NO_DELAY):
+            raise ValueError(f"поза {number}: задержка должна быть целым числом от 0 до {PoseSequence.NO_DELAY - 1}")
+
+    def __len__(self):
+        return len(self.delays)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        delay = self.delays[index]
+        return Pose(tuple(column[index] for column in self.angles),
+                    tuple(column[index] for column in self.speeds),
+                    None if delay == self.NO_DELAY else delay)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def __delitem__(self, index):
+        for column in (*self.angles, *self.speeds, self.delays):
+            del column[index]
+
+    def append(self, angles, speeds, delay=None):
+        for column, angle in zip(self.angles, angles):
+            column.append(angle)
+        for column, speed in zip(self.speeds, speeds):
+            column.append(speed)
+        self.delays.append(self.NO_DELAY if delay is None else delay)
+
+    def insert(self, index, angles, speeds, delay=None):
+        for column, angle in zip(self.angles, angles):
+            column.insert(index, angle)
+        for column, speed in zip(self.speeds, speeds):
+            column.insert(index, speed)
+        self.delays.insert(index, self.NO_DELAY if delay is None else delay)
+
+    def pop(self, index=-1):
+        pose = self[index]
+        del self[index]
+        return pose
+
+    def slice(self, start, stop):
+        sequence = PoseSequence(self.servo_count)
+        sequence.angles = [column[start:stop] for column in self.angles]
+        sequence.speeds = [column[start:stop] for column in self.speeds]
+        sequence.delays = self.delays[start:stop]
+        return sequence
+
+    def delete_range(self, start, stop):
+        for column in (*self.angles, *self.speeds, self.delays):
+            del column[start:stop]
+
+    def insert_sequence(self, index, sequence):
+        for column, other in zip((*self.angles, *self.speeds, self.delays),
+                                 (*sequence.angles, *sequence.speeds, sequence.delays)):
+            column[index:index] = other
+
+    def copy(self):
+        sequence = PoseSequence(self.servo_count)
+        sequence.angles = [array("B", column) for column in self.angles]
+        sequence.speeds = [array("B", column) for column in self.speeds]
+        sequence.delays = array("H", self.delays)
+        return sequence
+
+    @staticmethod
+    def _map_column(column, mapping):
+        table = bytes(max(0, min(180, round(mapping(value)))) for value in range(256))
+        return array("B", column.tobytes().translate(table))
+
+    def offset_angles(self, offsets):
+        """
+        Сдвигает углы каждого сервопривода на заданное число градусов (с ограничением 0..180).
+        """
+        self.angles = [self._map_column(column, lambda a, d=offset: a + d)
+                       for column, offset in zip(self.angles, offsets)]
+
+    def scale_angles(self, factors, center=90):
+        """
+        Масштабирует размах движения каждого сервопривода относительно центра.
+        """
+        self.angles = [self._map_column(column, lambda a, k=factor: center + (a - center) * k)
+                       for column, factor in zip(self.angles, factors)]
+
+    def time_stretch(self, factor, default_delay=None):
+        """
+        Умножает задержки шагов на factor.
+
+        :param default_delay: Задержка, которая подставляется шагам без собственной
+            задержки перед умножением. Если None, такие шаги остаются без задержки.
+        """
+        limit = self.NO_DELAY - 1
+        self.delays = array("H", (
+            (delay if default_delay is None else min(round(default_delay * factor), limit))
+            if delay == self.NO_DELAY else min(round(delay * factor), limit)
+            for delay in self.delays))
+
+    def to_records(self, start=0):
+        """
+        Упаковывает позы начиная со start в записи формата SequenceFile.
+        """
+        n = self.servo_count
+        size = 2 * n + 2
+        count = len(self) - start
+        data = bytearray(count * size)
+        for j in range(n):
+            data[j::size] = self.angles[j][start:].tobytes()
+            data[n + j::size] = self.speeds[j][start:].tobytes()
+        delays = self.delays[start:]
+        if sys.byteorder == "big":
+            delays.byteswap()
+        delays = delays.tobytes()
+        data[2 * n::size] = delays[0::2]
+        data[2 * n + 1::size] = delays[1::2]
+        return bytes(data)
+
+    @classmethod
+    def from_records(cls, data, servo_count):
+        n = servo_count
+        size = 2 * n + 2
+        data = data[:len(data) - len(data) % size]
+        sequence = cls(servo_count)
+        sequence.angles = [array("B", data[j::size]) for j in range(n)]
+        sequence.speeds = [array("B", data[n + j::size]) for j in range(n)]
+        delays = bytearray(2 * (len(data) // size))
+        delays[0::2] = data[2 * n::size]
+        delays[1::2] = data[2 * n + 1::size]
+        sequence.delays = array("H", bytes(delays))
+        if sys.byteorder == "big":
+            sequence.delays.byteswap()
+        return sequence
+
+
+class SequenceFile:
+    """
+    Файл последовательности поз в компактном двоичном формате (.rcs).
+
+    Заголовок: сигнатура b"RCSQ", версия и число сервоприводов N. Далее идут
+    записи фиксированного размера: N углов, N скоростей (по байту) и задержка
+    (uint16, мс; 0xFFFF — задержка не задана). Фиксированный размер записи
+    позволяет дописывать позы в конец файла, читать его потоково и обращаться
+    к любой позе без загрузки всего файла.
+    """
+
+    MAGIC = b"RCSQ"
+    VERSION = 1
+    HEADER = struct.Struct("<4sBBH")
+    CHUNK_RECORDS = 4096
+
+    def __init__(self, path):
+        self.path = path
+        self._servo_count = None
+
+    @property
+    def servo_count(self):
+        if self._servo_count is None:
+            with open(self.path, "rb") as f:
+                header = f.read(self.HEADER.size)
+            if len(header) < self.HEADER.size:
+                raise ValueError(f"{self.path} пуст или повреждён")
+            magic, version, servo_count, _ = self.HEADER.unpack(header)
+            if magic != self.MAGIC or version != self.VERSION or not servo_count:
+                raise ValueError(f"{self.path} не является файлом последовательности")
+            self._servo_count = servo_count
+        return self._servo_count
+
+    @property
+    def record_size(self):
+        return 2 * self.servo_count + 2
+
+    def __len__(self):
+        return (os.path.getsize(self.path) - self.HEADER.size) // self.record_size
+
+    def __iter__(self):
+        size = self.record_size * self.CHUNK_RECORDS
+        with open(self.path, "rb") as f:
+            f.seek(self.HEADER.size)
+            while True:
+                chunk = f.read(size)
+                if not chunk:
+                    break
+                yield from PoseSequence.from_records(chunk, self.servo_count)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        with open(self.path, "rb") as f:
+            f.seek(self.HEADER.size + index * self.record_size)
+            data = f.read(self.record_size)
+        if len(data) < self.record_size:
+            raise IndexError(index)
+        return PoseSequence.from_records(data, self.servo_count)[0]
+
+    def read(self):
+        """
+        Загружает файл целиком в PoseSequence.
+        """
+        with open(self.path, "rb") as f:
+            f.seek(self.HEADER.size)
+            return PoseSequence.from_records(f.read(), self.servo_count)
+
+    def write(self, sequence):
+        """
+        Перезаписывает файл целиком. Запись идёт во временный файл, который
+        затем атомарно заменяет старый.
+        """
+        self._servo_count = sequence.servo_count
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(self.HEADER.pack(self.MAGIC, self.VERSION, self._servo_count, 0))
+            f.write(sequence.to_records())
+        os.replace(temp_path, self.path)
+
+    def append(self, sequence, start=0):
+        """
+        Дописывает позы sequence начиная со start в конец файла; если файла нет, создаёт его.
+        """
+        if not os.path.exists(self.path):
+            self.write(sequence)
+            return
+        if sequence.servo_count != self.servo_count:
+            raise ValueError("Число сервоприводов не совпадает с файлом")
+        with open(self.path, "ab") as f:
+            f.write(sequence.to_records(start))
+
+    @classmethod
+    def import_json(cls, json_path, path):
+        """
+        Преобразует файл команд старого формата (JSON-список) в .rcs.
+        """
+        with open(json_path, "r") as f:
+            sequence = PoseSequence.from_poses(json.load(f))
+        sequence_file = cls(path)
+        sequence_file.write(sequence)
+        return sequence_file
+
+
+DEFAULT_RECORD_RATE = 20  # Гц
+DEFAULT_RECORD_TOLERANCE = 1.0  # градусы
+
+
+def rdp_keyframes(times, values, tolerance):
+    """
+    Прореживание Рамера — Дугласа — Пекера для одного сервопривода.
+
+    :param times: Метки времени выборок (по возрастанию).
+    :param values: Углы в этих выборках.
+    :param tolerance: Допустимое отклонение от отрезка между ключевыми кадрами, градусы.
+    :return: Множество индексов ключевых кадров, включая первый и последний.
+    """
+    last = len(values) - 1
+    keep = {0, last}
+    stack = [(0, last)]
+    while stack:
+        start, stop = stack.pop()
+        if stop - start < 2:
+            continue
+        t0, v0 = times[start], values[start]
+        span = times[stop] - t0
+        slope = (values[stop] - v0) / span if span else 0.0
+        worst, worst_index = tolerance, None
+        for i in range(start + 1, stop):
+            error = abs(values[i] - (v0 + slope * (times[i] - t0)))
+            if error > worst:
+                worst, worst_index = error, i
+        if worst_index is not None:
+            keep.add(worst_index)
+            stack.append((start, worst_index))
+            stack.append((worst_index, stop))
+    return keep
+
+
+class MotionRecorder:
+    """
+    Запись движения в режиме обучения.
+
+    Выборки углов и скоростей накапливаются с метками времени, а при
+    преобразовании в PoseSequence прореживаются по каждому сервоприводу
+    отдельно; ключевыми кадрами последовательности становится объединение
+    ключевых кадров всех приводов и моменты смены скорости. Первая поза
+    ставит руку в начальное положение, каждая следующая задаёт очередной
+    ключевой кадр со скоростью |Δугла| / Δt для каждого привода и задержкой
+    Δt, поэтому при воспроизведении рука проходит отрезки между кадрами в
+    исходном темпе, а не стоит и догоняет.
+    """
+
+    def __init__(self, servo_count=4):
+        self.servo_count = servo_count
+        self.times = []
+        self.angles = []
+        self.speeds = []
+
+    def __len__(self):
+        return len(self.times)
+
+    def sample(self, angles, speeds, timestamp=None):
+        self.times.append(time.monotonic() if timestamp is None else timestamp)
+        self.angles.append(tuple(angles))
+        self.speeds.append(tuple(speeds))
+
+    def keyframes(self, tolerance=DEFAULT_RECORD_TOLERANCE):
+        if not self.times:
+            return []
+        keep = set()
+        for joint in range(self.servo_count):
+            keep |= rdp_keyframes(self.times, [angles[joint] for angles in self.angles], tolerance)
+        keep.update(i for i in range(1, len(self.speeds)) if self.speeds[i] != self.speeds[i - 1])
+        return sorted(keep)
+
+    def to_sequence(self, tolerance=DEFAULT_RECORD_TOLERANCE):
+        """
+        :return: PoseSequence с ключевыми кадрами и задержками в миллисекундах.
+        """
+        sequence = PoseSequence(self.servo_count)
+        frames = self.keyframes(tolerance)
+        if not frames:
+            return sequence
+        # Поза отрезка отправляется в начале отрезка, а задержка после неё равна его длительности
+        targets = [(self.angles[frames[0]], self.speeds[frames[0]], 0)]
+        for previous, current in zip(frames, frames[1:]):
+            elapsed = self.times[current] - self.times[previous]
+            speeds = [max(1, min(100, round(abs(b - a) / elapsed))) if elapsed > 0 else 0
+                      for a, b in zip(self.angles[previous], self.angles[current])]
+            targets.append((self.angles[current], speeds, round(elapsed * 1000)))
+        for angles, speeds, delay in targets:
+            # Паузы длиннее, чем помещается в uint16, разбиваются повтором позы
+            while delay >= PoseSequence.NO_DELAY:
+                sequence.append(angles, speeds, PoseSequence.NO_DELAY - 1)
+                delay -= PoseSequence.NO_DELAY - 1
+            sequence.append(angles, speeds, delay)
+        return sequence
+
+    def clear(self):
+        self.times.clear()
+        self.angles.clear()
+        self.speeds.clear()
+
+
+FIRMWARE_SKETCH_NAME = "RoboCore"
+FIRMWARE_CACHE_DIR = os.path.join(os.environ.get("LOCALAPPDATA") or os.path.expanduser("~/.cache"),
+                                  "RoboCore", "firmware")
+
+
+class BuildCancelled(Exception):
+    pass
+
+
+class FirmwareBuilder(threading.Thread):
+    """
+    Фоновая сборка и загрузка прошивки через arduino-cli.
+
+    Установка ядра и библиотеки Servo пропускается, если они уже есть.
+    Результат компиляции кэшируется в каталоге, имя которого — хэш текста
+    скетча, FQBN и параметров сборки, поэтому повторная прошивка неизменённого
+    скетча сводится к одной загрузке. Одна сборка загружается на все платы
+    из ports параллельно, пулом не более max_workers потоков.
+
+    Ход работы передаётся через on_progress(сообщение, процент), состояние
+    каждой платы — через on_board(порт, состояние), итог — через
+    on_finished(успех, сообщение).
+    """
+
+    UPLOAD_TIMEOUT = 30
+
+    def __init__(self, sketch, ports, fqbn=FIRMWARE_FQBN, build_options=(), cache_dir=FIRMWARE_CACHE_DIR,
+                 max_workers=4, known_ports=(), on_identified=None, on_progress=None, on_board=None,
+                 on_finished=None):
+        super().__init__(daemon=True)
+        self.sketch = sketch
+        self.ports = list(ports)
+        self.known_ports = set(known_ports)
+        self.on_identified = on_identified
+        self.fqbn = fqbn
+        self.build_options = list(build_options)
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.on_progress = on_progress
+        self.on_board = on_board
+        self.on_finished = on_finished
+        self._processes = set()
+        self._lock = threading.Lock()
+        self._cancelled = False
+
+    @property
+    def cache_key(self):
+        digest = hashlib.sha256()
+        for part in (self.sketch, self.fqbn, *self.build_options):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()[:16]
+
+    def cancel(self):
+        with self._lock:
+            self._cancelled = True
+            for process in self._processes:
+                if process.poll() is None:
+                    process.terminate()
+
+    def progress(self, message, percent):
+        if self.on_progress:
+            self.on_progress(message, percent)
+
+    def board_status(self, port, status):
+        if self.on_board:
+            self.on_board(port, status)
+
+    def arduino_cli(self, *args, timeout=None):
+        """
+        Запускает arduino-cli с возможностью отмены.
+
+        :return: Стандартный вывод команды.
+        """
+        kwargs = {"creationflags": subprocess.CREATE_NO_WINDOW} if platform.system() == "Windows" else {}
+        with self._lock:
+            if self._cancelled:
+                raise BuildCancelled()
+            process = subprocess.Popen(["arduino-cli", *args], stdout=subprocess.PIPE,
+                                       stderr=subprocess.PIPE, **kwargs)
+            self._processes.add(process)
+        try:
+            stdout, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            raise
+        finally:
+            with self._lock:
+                self._processes.discard(process)
+        if self._cancelled:
+            raise BuildCancelled()
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, args, stdout, stderr)
+        return stdout.decode(errors="replace")
+
+    def write_sketch(self, sketch_dir):
+        # arduino-cli требует, чтобы каталог скетча назывался так же, как .ino файл
+        os.makedirs(sketch_dir, exist_ok=True)
+        sketch_path = os.path.join(sketch_dir, f"{FIRMWARE_SKETCH_NAME}.ino")
+        with open(sketch_path, "w") as f:
+            f.write(self.sketch)
+        return sketch_path
+
+    def run(self):
+        try:
+            self.build_and_upload()
+        except BuildCancelled:
+            self.finish(False, "Загрузка прошивки отменена.")
+        except subprocess.TimeoutExpired:
+            self.finish(False, "Выбран не тот порт или не правильная плата.")
+        except subprocess.CalledProcessError as e:
+            self.finish(False, f"Не удалось загрузить прошивку:\n{e.stderr.decode(errors='replace')}")
+        except Exception as e:
+            self.finish(False, str(e))
+
+    def build_and_upload(self):
+        self.progress("Проверка плат", 5)
+        # arduino-cli board list запускается, только если среди портов есть неопознанные
+        ports = [port for port in self.ports if port in self.known_ports]
+        if len(ports) < len(self.ports):
+            board_list = self.arduino_cli("board", "list")
+            for port in self.ports:
+                if port not in self.known_ports:
+                    is_arduino = port in board_list
+                    if is_arduino:
+                        ports.append(port)
+                    if self.on_identified:
+                        self.on_identified(port, is_arduino)
+        for port in set(self.ports) - set(ports):
+            self.board_status(port, "не Arduino плата")
+        if not ports:
+            self.finish(False, "Выбранный порт не поддерживает Arduino плату.")
+            return
+
+        build_root = os.path.join(self.cache_dir, self.cache_key)
+        sketch_dir = os.path.join(build_root, FIRMWARE_SKETCH_NAME)
+        output_dir = os.path.join(build_root, "build")
+        hex_path = os.path.join(output_dir, f"{FIRMWARE_SKETCH_NAME}.ino.hex")
+        if os.path.exists(hex_path):
+            # Ядро и библиотека уже стояли, когда прошивка собиралась, поэтому
+            # для повторной прошивки остаётся только загрузка
+            self.progress("Используется собранная ранее прошивка", 70)
+        else:
+            self.progress("Проверка ядра arduino:avr", 15)
+            core = ":".join(self.fqbn.split(":")[:2])
+            if core not in self.arduino_cli("core", "list"):
+                self.progress("Установка ядра arduino:avr", 20)
+                self.arduino_cli("core", "install", core)
+
+            self.progress("Проверка библиотеки Servo", 35)
+            if "Servo" not in self.arduino_cli("lib", "list"):
+                self.progress("Установка библиотеки Servo", 40)
+                self.arduino_cli("lib", "install", "Servo")
+
+            self.progress("Компиляция", 50)
+            sketch_path = self.write_sketch(sketch_dir)
+            self.arduino_cli("compile", "--fqbn", self.fqbn, "--output-dir", output_dir,
+                             *self.build_options, sketch_path)
+
+        self.progress("Загрузка на платы", 80)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            results = list(pool.map(lambda port: self.upload(port, output_dir), ports))
+        if self._cancelled:
+            raise BuildCancelled()
+        self.progress("Готово", 100)
+        failed = len(self.ports) - sum(results)
+        if not failed:
+            self.finish(True, "Прошивка успешно загружена!")
+        else:
+            self.finish(False, f"Прошивка не загружена на {failed} из {len(self.ports)} плат.")
+
+    def upload(self, port, output_dir):
+        """
+        Загружает собранную прошивку на одну плату.
+
+        :return: True, если загрузка прошла успешно.
+        """
+        self.board_status(port, "загрузка")
+        try:
+            self.arduino_cli("upload", "-p", port, "--fqbn", self.fqbn, "--input-dir", output_dir,
+                             timeout=self.UPLOAD_TIMEOUT)
+        except BuildCancelled:
+            self.board_status(port, "отменено")
+            return False
+        except subprocess.TimeoutExpired:
+            self.board_status(port, "нет ответа: не тот порт или не та плата")
+            return False
+        except subprocess.CalledProcessError as e:
+            self.board_status(port, f"ошибка: {e.stderr.decode(errors='replace').strip()}")
+            return False
+        self.board_status(port, "готово")
+        return True
+
+    def finish(self, success, message):
+        if self.on_finished:
+            self.on_finished(success, message)
+
+
+class ServoController:
+    """
+    Управление подключёнными платами без графического интерфейса.
+
+    Контроллер владеет потоками записи открытых портов, потоком плавного
+    движения и проигрывателем последовательностей; команды рассылаются во все
+    очереди одновременно. Порты открываются через open_serial, поэтому вместо
+    платы можно указать loop:// или виртуальную плату sim://.
+    on_error(сообщение) и on_baudrate(порт, скорость) вызываются из фоновых
+    потоков.
+    """
+
+    def __init__(self, servo_count=4, on_error=None, on_baudrate=None):
+        self.on_error = on_error
+        self.on_baudrate = on_baudrate
+        self.writers = []
+        self.telemetry = SerialTelemetry()
+        self.streamer = None
+        self.smooth_motion = False
+        self.player = None
+        # Последняя отправленная поза: от неё начинает плавное движение и
+        # по ней оценивается размер кадра
+        self.angles = [90] * servo_count
+        self.speeds = [50] * servo_count
+
+    @property
+    def ports(self):
+        return [writer.ser.port for writer in self.writers]
+
+    def open(self, port, baudrate=DEFAULT_BAUDRATE, protocol=PROTOCOL_TEXT, negotiate=False, ack=False,
+             boot_delay=None):
+        """
+        Открывает порт и запускает для него поток записи.
+
+        :param boot_delay: Время загрузки платы после открытия порта, с. По умолчанию
+            SerialWriter.BOOT_DELAY для COM-портов, параметр boot для sim:// и 0 для
+            остальных URL pyserial.
+        :raises serial.SerialException: Если порт не удалось открыть.
+        """
+        ser = open_serial(port, baudrate)
+        if boot_delay is None:
+            boot_delay = getattr(ser, "boot", 0.0 if "://" in port else SerialWriter.BOOT_DELAY)
+        on_baudrate = (lambda rate: self.on_baudrate(port, rate)) if self.on_baudrate else None
+        writer = SerialWriter(ser, CoalescingCommandQueue(), self.on_error, protocol,
+                              negotiate=negotiate, on_baudrate=on_baudrate,
+                              ack_window=AckWindow() if ack else None,
+                              telemetry=self.telemetry, boot_delay=boot_delay)
+        writer.start()
+        self.writers.append(writer)
+        if not self.streamer:
+            self.streamer = MotionStreamer(MotionPlanner(self.angles), self.send_pose, self.stream_rate)
+            self.streamer.start()
+        return writer
+
+    def drop(self, port):
+        """
+        Закрывает поток записи отключённой платы.
+
+        :return: True, если порт был подключён.
+        """
+        dropped = [writer for writer in self.writers if writer.ser.port == port]
+        for writer in dropped:
+            writer.stop()
+            self.writers.remove(writer)
+        return bool(dropped)
+
+    def close(self):
+        if self.streamer:
+            self.streamer.stop()
+            self.streamer = None
+        for writer in self.writers:
+            writer.stop()
+        self.writers = []
+
+    def set_protocol(self, protocol):
+        for writer in self.writers:
+            writer.protocol = protocol
+
+    def send_servo(self, servo_num, angle, speed):
+        self.angles[servo_num - 1] = angle
+        self.speeds[servo_num - 1] = speed
+        command = ServoCommand(servo_num, angle, speed)
+        for writer in list(self.writers):
+            writer.command_queue.put(servo_num, command)
+        self.telemetry.record_enqueue()
+
+    def send_pose(self, angles, speeds):
+        # Вызывается из потоков воспроизведения и плавного движения
+        command = PoseCommand(tuple(angles), tuple(speeds))
+        for writer in list(self.writers):
+            writer.command_queue.put(POSE_KEY, command)
+        self.telemetry.record_enqueue()
+
+    def move_to(self, angles, speeds):
+        """
+        Переводит сервоприводы в позу: плавно через MotionStreamer или одной командой.
+        """
+        self.angles = list(angles)
+        self.speeds = list(speeds)
+        if self.smooth_motion and self.streamer:
+            self.streamer.move_to(angles, speeds)
+        else:
+            self.send_pose(angles, speeds)
+
+    def stream_rate(self):
+        # Частота ограничивается самым медленным из подключённых каналов
+        pose = PoseCommand(tuple(self.angles), tuple(self.speeds))
+        return min((link_control_rate(writer.ser.baudrate, len(encode_command(writer.protocol, pose)))
+                    for writer in list(self.writers)), default=MAX_CONTROL_RATE)
+
+    def wait_ready(self, cancelled=lambda: False):
+        """
+        Ждёт готовности всех плат (загрузка и согласование скорости завершены).
+
+        :param cancelled: Функция, возвращающая True, если ожидание пора прервать.
+        :return: Общий момент старта по time.perf_counter, к которому каналы всех
+            плат свободны, или None, если ожидание прервано.
+        """
+        writers = list(self.writers)
+        while not all(writer.ready.is_set() or writer.command_queue.closed for writer in writers):
+            if cancelled():
+                return None
+            time.sleep(0.01)
+        return max([time.perf_counter()] + [writer.link_busy_until for writer in writers]) + SYNC_START_MARGIN
+
+    def play(self, poses, default_delay, loop=False, on_step=None, on_finished=None):
+        """
+        Запускает воспроизведение поз: PoseSequence или SequenceFile, читаемого по мере проигрывания.
+        Первая поза отправляется, когда готовы все платы, одновременно во все каналы.
+
+        :return: Запущенный SequencePlayer.
+        """
+        self.stop_playback()
+        self.player = SequencePlayer(poses, default_delay, self.move_to, loop=loop,
+                                     on_step=on_step, on_finished=on_finished, wait_ready=self.wait_ready)
+        self.player.start()
+        return self.player
+
+    def stop_playback(self):
+        if self.player:
+            self.player.stop()
+            self.player.join(timeout=1)
+            self.player = None
+
+    def wait_idle(self, timeout=None):
+        """
+        Ждёт, пока плавное движение завершится и очереди всех плат опустеют.
+
+        :return: False, если время ожидания истекло.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while ((self.streamer and self.streamer.planner.moving)
+               or any(len(writer.command_queue) for writer in self.writers)
+               or any(writer.ack_window is not None and len(writer.ack_window) for writer in self.writers)):
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def telemetry_summary(self):
+        summary = self.telemetry.snapshot()
+        summary["superseded"] = sum(writer.command_queue.superseded for writer in self.writers)
+        summary["dropped"] = sum(writer.command_queue.dropped for writer in self.writers)
+        ack_stats = [writer.ack_window.stats() for writer in self.writers if writer.ack_window is not None]
+        if ack_stats:
+            for key in ack_stats[0]:
+                values = [stats[key] for stats in ack_stats]
+                if key == "latency_max_ms":
+                    summary[f"ack_{key}"] = max(values)
+                elif key == "latency_avg_ms":
+                    summary[f"ack_{key}"] = sum(values) / len(values)
+                else:
+                    summary[f"ack_{key}"] = sum(values)
+        return summary
+
+
+def load_sequence(path):
+    """
+    Открывает последовательность для воспроизведения.
+
+    :param path: Файл .rcs (читается по мере проигрывания) или JSON старого формата.
+    :return: SequenceFile или PoseSequence.
+    """
+    if path.endswith(".json"):
+        with open(path, "r") as f:
+            return PoseSequence.from_poses(json.load(f))
+    return SequenceFile(path)
+
+
+def parse_pose_line(line, servo_count, default_speed):
+    """
+    Разбирает строку «угол1 … уголN [скорость1 … скоростьN]» (через пробелы или запятые).
+
+    :return: Пара (углы, скорости).
+    :raises ValueError: Если число значений не подходит или скорость вне диапазона 0–100.
+    """
+    try:
+        values = [int(value) for value in line.replace(",", " ").split()]
+    except ValueError:
+        raise ValueError("углы и скорости должны быть целыми числами") from None
+    if len(values) == servo_count:
+        angles, speeds = values, [default_speed] * servo_count
+    elif len(values) == 2 * servo_count:
+        angles, speeds = values[:servo_count], values[servo_count:]
+    else:
+        raise ValueError(f"ожидается {servo_count} или {2 * servo_count} чисел, получено {len(values)}")
+    # Скорость уходит в кадр как есть: значения больше 180 совпали бы со стартовыми байтами
+    if not all(0 <= speed <= 100 for speed in speeds):
+        raise ValueError("скорости должны быть от 0 до 100")
+    return angles, speeds
+
+
+def open_controller(args, servo_count):
+    controller = ServoController(servo_count, on_error=lambda message: print(f"Ошибка: {message}", file=sys.stderr))
+    controller.smooth_motion = args.smooth
+    for port in args.port:
+        # Виртуальная плата получает каналы выбранного профиля
+        if port == SIMULATOR_URL:
+            port = f"{SIMULATOR_URL}?servos={servo_count}" if getattr(args, "servos", None) else \
+                f"{SIMULATOR_URL}?profile={args.profile}"
+        controller.open(port, args.baudrate, args.protocol, negotiate=args.negotiate, ack=args.ack)
+    return controller
+
+
+def close_controller(controller, args):
+    controller.wait_idle(timeout=5)
+    if args.stats:
+        print(json.dumps(controller.telemetry_summary(), ensure_ascii=False, indent=2))
+    controller.close()
+
+
+def command_ports(args):
+    identifier = BoardIdentifier()
+    for port in sorted(serial.tools.list_ports.comports(), key=lambda port: port.device):
+        board = "Arduino" if identifier.is_arduino(port) else "-"
+        print(f"{port.device}\t{board}\t{port.description}")
+    return 0
+
+
+def command_profiles(args):
+    for name in DeviceProfile.available():
+        try:
+            profile = DeviceProfile.load(name)
+        except (OSError, ValueError) as e:
+            print(f"{name}\tошибка: {e}")
+            continue
+        print(f"{name}\t{profile.servo_count}\t{profile.fqbn}\t{profile.title}")
+    return 0
+
+
+def command_play(args):
+    poses = load_sequence(args.file)
+    profile = DeviceProfile.load(args.profile)
+    if poses.servo_count != profile.servo_count:
+        raise ValueError(f"в файле {poses.servo_count} сервоприводов, в профиле {profile.name} — {profile.servo_count}")
+    controller = open_controller(args, poses.servo_count)
+    finished = threading.Event()
+    player = controller.play(poses, args.delay, loop=args.loop, on_finished=finished.set)
+    try:
+        while not finished.wait(0.2):
+            pass
+    except KeyboardInterrupt:
+        player.stop()
+    close_controller(controller, args)
+    return 0
+
+
+def command_stream(args):
+    profile = DeviceProfile.generic(args.servos) if args.servos else DeviceProfile.load(args.profile)
+    controller = open_controller(args, profile.servo_count)
+    status = 0
+    deadline = time.perf_counter()
+    try:
+        for number, line in enumerate(sys.stdin, 1):
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            try:
+                angles, speeds = parse_pose_line(line, profile.servo_count, args.speed)
+            except ValueError as e:
+                print(f"Строка {number}: {e}", file=sys.stderr)
+                status = 1
+                continue
+            # Каждая поза уходит на плату (при --smooth — доезжает) до чтения следующей,
+            # иначе очередь оставила бы от файла только последние строки
+            controller.move_to(profile.clamp(angles), speeds)
+            controller.wait_idle()
+            deadline = max(deadline + args.delay / 1000, time.perf_counter())
+            time.sleep(max(0.0, deadline - time.perf_counter()))
+    except KeyboardInterrupt:
+        pass
+    close_controller(controller, args)
+    return status
+
+
+def command_flash(args):
+    result = {"success": False, "message": ""}
+    profile = DeviceProfile.load(args.profile)
+    builder = FirmwareBuilder(build_firmware(args.baudrate, profile=profile), args.port, fqbn=args.fqbn or profile.fqbn,
+                              on_progress=lambda message, percent: print(f"[{percent:3d}%] {message}"),
+                              on_board=lambda port, status: print(f"{port}: {status}"),
+                              on_finished=lambda success, message: result.update(success=success, message=message))
+    builder.start()
+    try:
+        while builder.is_alive():
+            builder.join(0.2)
+    except KeyboardInterrupt:
+        builder.cancel()
+        builder.join()
+    print(result["message"], file=sys.stdout if result["success"] else sys.stderr)
+    return 0 if result["success"] else 1
+
+
+def main(argv=None):
+    """
+    Командная строка: воспроизведение, потоковое управление и прошивка без GUI.
+
+    :return: Код завершения.
+    """
+    parser = argparse.ArgumentParser(prog="ServoCore", description="Управление сервоприводами RoboCore без GUI")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    link = argparse.ArgumentParser(add_help=False)
+    link.add_argument("-p", "--port", action="append", required=True,
+                      help="COM-порт, URL pyserial (loop://) или виртуальная плата sim://; можно указать несколько раз")
+    link.add_argument("-b", "--baudrate", type=int, default=DEFAULT_BAUDRATE, choices=BAUD_RATES)
+    link.add_argument("--protocol", choices=(PROTOCOL_TEXT, PROTOCOL_BINARY), default=PROTOCOL_TEXT)
+    link.add_argument("--negotiate", action="store_true", help="согласовать максимальную скорость порта")
+    link.add_argument("--ack", action="store_true", help="ждать подтверждений команд от платы")
+    link.add_argument("--smooth", action="store_true", help="плавное движение с планировщиком")
+    link.add_argument("--stats", action="store_true", help="вывести телеметрию канала по завершении")
+    link.add_argument("--profile", default=DEFAULT_PROFILE.name,
+                      help=f"профиль устройства из {PROFILES_DIR} или путь к .json")
+
+    ports_parser = commands.add_parser("ports", help="список COM-портов")
+    ports_parser.set_defaults(handler=command_ports)
+
+    profiles_parser = commands.add_parser("profiles", help="список профилей устройств")
+    profiles_parser.set_defaults(handler=command_profiles)
+
+    play_parser = commands.add_parser("play", parents=[link], help="воспроизвести файл .rcs или .json")
+    play_parser.add_argument("file")
+    play_parser.add_argument("--delay", type=int, default=500, help="задержка по умолчанию, мс")
+    play_parser.add_argument("--loop", action="store_true")
+    play_parser.set_defaults(handler=command_play)
+
+    stream_parser = commands.add_parser("stream", parents=[link],
+                                        help="отправлять позы из stdin: углы [скорости] в строке")
+    stream_parser.add_argument("--servos", type=int, help="число сервоприводов вместо профиля")
+    stream_parser.add_argument("--delay", type=int, default=0, help="интервал между позами, мс")
+    stream_parser.add_argument("--speed", type=int, default=50, help="скорость, если в строке только углы")
+    stream_parser.set_defaults(handler=command_stream)
+
+    flash_parser = commands.add_parser("flash", help="собрать и загрузить прошивку")
+    flash_parser.add_argument("-p", "--port", action="append", required=True)
+    flash_parser.add_argument("-b", "--baudrate", type=int, default=DEFAULT_BAUDRATE, choices=BAUD_RATES)
+    flash_parser.add_argument("--profile", default=DEFAULT_PROFILE.name,
+                              help=f"профиль устройства из {PROFILES_DIR} или путь к .json")
+    flash_parser.add_argument("--fqbn", help="плата для arduino-cli; по умолчанию из профиля")
+    flash_parser.set_defaults(handler=command_flash)
+
+    args = parser.parse_args(argv)
+    try:
+        return args.handler(args)
+    except (OSError, ValueError, serial.SerialException) as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
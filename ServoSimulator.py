@@ -0,0 +1,414 @@
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit, parse_qs
+
+import serial
+
+from ServoCore import (FRAME_SERVO, FRAME_POSE, FRAME_SEQUENCE, DEFAULT_BAUDRATE, MAX_BAUDRATE,
+                       SIMULATOR_URL, ServoCommand, PoseCommand, DeviceProfile, DEFAULT_PROFILE)
+
+
+class FirmwareSimulator:
+    """
+    Модель прошивки arduino_template на Python.
+
+    Повторяет разбор текстовых и двоичных команд, согласование скорости,
+    подтверждения и неблокирующее движение с шагом TICK_MS. Вместо Serial
+    прошивка работает с объектом uart: device_print, device_flush, device_begin.
+    Каналы, их пределы и положения после включения берутся из профиля устройства.
+    Применённые команды вместе с моментом применения попадают в history.
+    """
+
+    TICK_MS = 10
+
+    def __init__(self, uart, profile=DEFAULT_PROFILE, max_baudrate=MAX_BAUDRATE, history_size=10000):
+        self.uart = uart
+        self.servo_count = profile.servo_count
+        self.limits = [(channel.min_angle, channel.max_angle) for channel in profile.channels]
+        self.line_size = 16 + 8 * self.servo_count
+        self.max_baudrate = max_baudrate
+        self.current = [home * 100 for home in profile.homes]
+        self.target = list(self.current)
+        self.speed = [0] * self.servo_count
+        self.last_tick = 0.0
+        self.line = bytearray()
+        self.frame = bytearray()
+        self.frame_size = 0
+        self.pending_seq = -1
+        self.history = deque(maxlen=history_size)
+        self.clock = 0.0
+
+    @property
+    def angles(self):
+        return [(current + 50) // 100 for current in self.current]
+
+    @property
+    def moving(self):
+        return self.current != self.target
+
+    def receive(self, c, now):
+        """
+        Обрабатывает один принятый байт, как тело цикла loop().
+
+        :param now: Момент обработки в секундах.
+        """
+        self.clock = now
+        if c in (FRAME_SERVO, FRAME_POSE, FRAME_SEQUENCE):
+            self.frame = bytearray((c,))
+            if c == FRAME_SERVO:
+                self.frame_size = 5
+            elif c == FRAME_POSE:
+                self.frame_size = 3 + 2 * self.servo_count
+            else:
+                self.frame_size = 3
+        elif self.frame:
+            self.frame.append(c)
+            if len(self.frame) == self.frame_size:
+                self.parse_frame()
+                self.frame = bytearray()
+        elif c == ord("\n"):
+            self.parse_line()
+            self.line = bytearray()
+        elif len(self.line) < self.line_size - 1:
+            self.line.append(c)
+
+    def apply_command(self, servo_num, angle, servo_speed):
+        if servo_num < 1 or servo_num > self.servo_count:
+            return
+        i = servo_num - 1
+        if not self.moving:
+            # Пока сервоприводы стоят, такты не моделируются; lastTick в прошивке
+            # всё это время обновлялся, поэтому выравниваем его по сетке TICK_MS
+            now = self.clock * 1000
+            self.last_tick = now - (now - self.last_tick) % self.TICK_MS
+        low, high = self.limits[i]
+        self.target[i] = max(low, min(high, angle)) * 100
+        self.speed[i] = servo_speed
+        if servo_speed == 0:
+            self.current[i] = self.target[i]
+
+    def update_motion(self, now):
+        """
+        Шаг движения updateMotion().
+
+        :param now: Момент в секундах.
+        """
+        now_ms = now * 1000
+        elapsed = now_ms - self.last_tick
+        if elapsed < self.TICK_MS:
+            return
+        self.last_tick = now_ms
+        for i in range(self.servo_count):
+            if self.current[i] == self.target[i]:
+                continue
+            step = max(1, int(self.speed[i] * elapsed) // 10)
+            if self.current[i] < self.target[i]:
+                self.current[i] = min(self.current[i] + step, self.target[i])
+            else:
+                self.current[i] = max(self.current[i] - step, self.target[i])
+
+    @property
+    def next_tick(self):
+        """
+        Момент следующего шага движения в секундах или None, если всё стоит.
+        """
+        return (self.last_tick + self.TICK_MS) / 1000 if self.moving else None
+
+    def acknowledge(self, command):
+        self.history.append((self.clock, command))
+        self.uart.device_executed()
+        if self.pending_seq >= 0:
+            self.uart.device_print(f"A{self.pending_seq}\r\n".encode("ascii"))
+            self.pending_seq = -1
+
+    def parse_handshake(self):
+        if self.line[:1] == b"?":
+            self.uart.device_print(f"RC {self.max_baudrate}\r\n".encode("ascii"))
+            return True
+        if self.line[:1] == b"B":
+            rate = atoi(self.line[1:])
+            if 0 < rate <= self.max_baudrate:
+                self.uart.device_print(b"OK\r\n")
+                self.uart.device_flush()
+                self.uart.device_begin(rate)
+            return True
+        return False
+
+    def parse_line(self):
+        line = self.line
+        if line and self.parse_handshake():
+            return
+        if line[:1] == b"#":
+            self.pending_seq = atoi(line[1:])
+            return
+        values = [0] * max(3, 2 * self.servo_count)
+        pose = line[:1] == b"P"
+        max_fields = 2 * self.servo_count if pose else 3
+        field = 0
+        for c in line[2 if pose else 0:]:
+            if field >= max_fields:
+                break
+            if c == ord(","):
+                field += 1
+            elif ord("0") <= c <= ord("9"):
+                values[field] = values[field] * 10 + c - ord("0")
+        if pose:
+            if field == max_fields - 1:
+                angles, speeds = values[:self.servo_count], values[self.servo_count:]
+                for i in range(self.servo_count):
+                    self.apply_command(i + 1, angles[i], speeds[i])
+                self.acknowledge(PoseCommand(tuple(angles), tuple(speeds)))
+        elif field >= 1:
+            self.apply_command(*values[:3])
+            self.acknowledge(ServoCommand(*values[:3]))
+
+    def parse_frame(self):
+        frame = self.frame
+        if sum(frame[1:-1]) & 0x7F != frame[-1]:
+            return
+        if frame[0] == FRAME_SEQUENCE:
+            self.pending_seq = frame[1]
+        elif frame[0] == FRAME_SERVO:
+            self.apply_command(frame[1], frame[2], frame[3])
+            self.acknowledge(ServoCommand(frame[1], frame[2], frame[3]))
+        elif frame[1] == self.servo_count:
+            angles = tuple(frame[2:2 + self.servo_count])
+            speeds = tuple(frame[2 + self.servo_count:2 + 2 * self.servo_count])
+            for i in range(self.servo_count):
+                self.apply_command(i + 1, angles[i], speeds[i])
+            self.acknowledge(PoseCommand(angles, speeds))
+
+
+def atoi(data):
+    """
+    Разбирает число в начале байтовой строки, как atoi/atol в C.
+    """
+    digits = bytearray()
+    for c in bytes(data).lstrip():
+        if ord("0") <= c <= ord("9") or (not digits and c in b"+-"):
+            digits.append(c)
+        else:
+            break
+    try:
+        return int(digits)
+    except ValueError:
+        return 0
+
+
+class SimulatedSerial(serial.SerialBase):
+    """
+    Виртуальный COM-порт с платой, на которой работает FirmwareSimulator.
+
+    Каждый байт передаётся за 10 / скорость секунд в обе стороны. Компьютер
+    пишет в выходной буфер драйвера размером write_buffer байт: write()
+    блокируется, пока в нём нет места. Плата принимает байты в кольцевой
+    буфер на rx_buffer байт (64 у Arduino); если прошивка не успевает его
+    разбирать, новые байты теряются. Байты, отправленные на скорости,
+    отличной от скорости приёмника, тоже теряются. На разбор байта прошивка
+    тратит byte_cost секунд, на применение команды — command_cost, после
+    открытия порта плата boot секунд находится в загрузчике.
+
+    Параметры задаются в URL: sim://?rx_buffer=64&boot=1.6&servos=4; вместо
+    числа сервоприводов можно указать профиль устройства: sim://?profile=arm6.
+    Время моделируется по отметкам времени байтов, а не по пробуждениям
+    потоков, поэтому потери и задержки не зависят от планировщика ОС.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._condition = threading.Condition()
+        self.rx_buffer = 64
+        self.write_buffer = 4096
+        self.byte_cost = 10e-6
+        self.command_cost = 60e-6
+        self.tick_cost = 100e-6
+        self.boot = 0.0
+        self.profile = DEFAULT_PROFILE
+        self.max_baudrate = MAX_BAUDRATE
+        self.device = None
+        super().__init__(*args, **kwargs)
+
+    def from_url(self, url):
+        parts = urlsplit(url)
+        if f"{parts.scheme}://" != SIMULATOR_URL:
+            raise serial.SerialException(f"Ожидается URL вида {SIMULATOR_URL}?параметр=значение: {url}")
+        for name, values in parse_qs(parts.query).items():
+            if name == "profile":
+                try:
+                    self.profile = DeviceProfile.load(values[-1])
+                except (OSError, ValueError) as e:
+                    raise serial.SerialException(str(e)) from None
+            elif name == "servos":
+                self.profile = DeviceProfile.generic(int(values[-1]))
+            elif name in ("rx_buffer", "write_buffer", "max_baudrate"):
+                setattr(self, name, int(values[-1]))
+            elif name in ("byte_cost", "command_cost", "tick_cost", "boot"):
+                setattr(self, name, float(values[-1]))
+            else:
+                raise serial.SerialException(f"Неизвестный параметр симулятора: {name}")
+
+    def open(self):
+        if self._port is None:
+            raise serial.SerialException("Port must be configured before it can be used.")
+        if self.is_open:
+            raise serial.SerialException("Port is already open.")
+        self.from_url(self._port)
+        now = time.perf_counter()
+        self.device = FirmwareSimulator(self, self.profile, self.max_baudrate)
+        self.device.last_tick = now * 1000
+        self.device_baudrate = DEFAULT_BAUDRATE if self._baudrate is None else self._baudrate
+        self.boot_until = now + self.boot
+        # Байты в пути: (момент доставки, байт, скорость передатчика)
+        self.to_device = deque()
+        self.to_host = deque()
+        self.device_rx = deque()
+        self.host_rx = bytearray()
+        self.to_device_free = now
+        self.to_host_free = now
+        self.device_ready = now
+        self.stats = {"bytes_received": 0, "bytes_sent": 0, "commands": 0, "overruns": 0,
+                      "framing_errors": 0, "lost_during_boot": 0}
+        self.is_open = True
+
+    def close(self):
+        self.is_open = False
+
+    def _reconfigure_port(self):
+        # Скорость компьютера читается при каждой записи и чтении
+        pass
+
+    # Сторона платы: аналог Serial в прошивке
+
+    def device_print(self, data):
+        byte_time = 10 / self.device_baudrate
+        for c in data:
+            self.to_host_free = max(self.to_host_free, self.device.clock) + byte_time
+            self.to_host.append((self.to_host_free, c, self.device_baudrate))
+            self.stats["bytes_sent"] += 1
+
+    def device_flush(self):
+        self.device_ready = max(self.device_ready, self.to_host_free)
+
+    def device_begin(self, rate):
+        self.device_baudrate = rate
+
+    def device_executed(self):
+        self.stats["commands"] += 1
+        self.device_ready += self.command_cost
+
+    def advance(self, now):
+        """
+        Проигрывает события платы вплоть до момента now. Вызывается под блокировкой.
+        """
+        device = self.device
+        while True:
+            arrival = self.to_device[0][0] if self.to_device else None
+            read = max(self.device_ready, self.device_rx[0][0]) if self.device_rx else None
+            tick = device.next_tick
+            if tick is not None:
+                tick = max(tick, self.device_ready)
+            moment = min((t for t in (arrival, read, tick) if t is not None), default=None)
+            if moment is None or moment > now:
+                break
+            if moment == arrival:
+                _, c, baudrate = self.to_device.popleft()
+                if moment < self.boot_until:
+                    self.stats["lost_during_boot"] += 1
+                elif baudrate != self.device_baudrate:
+                    self.stats["framing_errors"] += 1
+                elif len(self.device_rx) >= self.rx_buffer:
+                    self.stats["overruns"] += 1
+                else:
+                    self.device_rx.append((moment, c))
+                    self.stats["bytes_received"] += 1
+            elif moment == read:
+                _, c = self.device_rx.popleft()
+                self.device_ready = moment + self.byte_cost
+                device.receive(c, moment)
+            else:
+                device.clock = moment
+                device.update_motion(moment)
+                self.device_ready = moment + self.tick_cost
+        while self.to_host and self.to_host[0][0] <= now:
+            _, c, baudrate = self.to_host.popleft()
+            if baudrate == self._baudrate:
+                self.host_rx.append(c)
+
+    def next_event(self):
+        events = [self.to_device[0][0] if self.to_device else None,
+                  self.to_host[0][0] if self.to_host else None,
+                  max(self.device_ready, self.device_rx[0][0]) if self.device_rx else None]
+        return min((t for t in events if t is not None), default=None)
+
+    # Сторона компьютера: интерфейс pyserial
+
+    @property
+    def in_waiting(self):
+        if not self.is_open:
+            raise serial.PortNotOpenError()
+        with self._condition:
+            self.advance(time.perf_counter())
+            return len(self.host_rx)
+
+    def read(self, size=1):
+        if not self.is_open:
+            raise serial.PortNotOpenError()
+        deadline = None if self._timeout is None else time.perf_counter() + self._timeout
+        with self._condition:
+            while True:
+                now = time.perf_counter()
+                self.advance(now)
+                if len(self.host_rx) >= size or (deadline is not None and now >= deadline):
+                    data = bytes(self.host_rx[:size])
+                    del self.host_rx[:size]
+                    return data
+                wakeup = min(t for t in (self.next_event(), deadline, now + 0.01) if t is not None)
+                self._condition.wait(max(0.0, wakeup - now))
+
+    def write(self, data):
+        if not self.is_open:
+            raise serial.PortNotOpenError()
+        data = bytes(data)
+        byte_time = 10 / self._baudrate
+        with self._condition:
+            for c in data:
+                # Буфер драйвера полон: ждём, пока уйдёт самый старый байт
+                while len(self.to_device) >= self.write_buffer:
+                    now = time.perf_counter()
+                    self.advance(now)
+                    if len(self.to_device) >= self.write_buffer:
+                        self._condition.wait(max(0.0, self.to_device[0][0] - now))
+                now = time.perf_counter()
+                self.to_device_free = max(self.to_device_free, now) + byte_time
+                self.to_device.append((self.to_device_free, c, self._baudrate))
+            self.advance(time.perf_counter())
+            self._condition.notify_all()
+        return len(data)
+
+    def flush(self):
+        with self._condition:
+            while self.to_device:
+                now = time.perf_counter()
+                self.advance(now)
+                if self.to_device:
+                    self._condition.wait(max(0.0, self.to_device[-1][0] - now))
+
+    def reset_input_buffer(self):
+        with self._condition:
+            self.advance(time.perf_counter())
+            self.host_rx.clear()
+
+    def reset_output_buffer(self):
+        with self._condition:
+            now = time.perf_counter()
+            self.advance(now)
+            self.to_device.clear()
+            self.to_device_free = now
+
+    def device_state(self):
+        """
+        :return: Углы сервоприводов платы на текущий момент и статистика канала.
+        """
+        with self._condition:
+            self.advance(time.perf_counter())
+            return self.device.angles, dict(self.stats)
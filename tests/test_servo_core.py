@@ -0,0 +1,193 @@
+import io
+import json
+import time
+
+import pytest
+
+from ArmKinematics import ArmModel
+from ServoCore import (PROTOCOL_TEXT, PROTOCOL_BINARY, POSE_KEY, ServoCommand, PoseCommand, CoalescingCommandQueue,
+                       AckWindow, PoseSequence, SequenceFile, MotionRecorder, ServoController, FirmwareBuilder,
+                       encode_command, parse_pose_line, main)
+
+
+def test_queue_latest_wins_keeps_position():
+    queue = CoalescingCommandQueue()
+    queue.put(1, ServoCommand(1, 10, 0))
+    queue.put(2, ServoCommand(2, 20, 0))
+    queue.put(1, ServoCommand(1, 30, 0))
+    assert queue.get(0) == ServoCommand(1, 30, 0)
+    assert queue.get(0) == ServoCommand(2, 20, 0)
+    assert queue.get(0) is None
+    assert queue.superseded == 1
+
+
+def test_queue_pose_supersedes_pending_servo_commands():
+    queue = CoalescingCommandQueue()
+    pose = PoseCommand((90,) * 4, (0,) * 4)
+    queue.put(1, ServoCommand(1, 10, 0))
+    queue.put(POSE_KEY, pose)
+    queue.put(1, ServoCommand(1, 150, 0))
+    assert queue.get(0) == pose
+    assert queue.get(0) == ServoCommand(1, 150, 0)
+    assert queue.get(0) is None
+
+
+def test_queue_drops_oldest_when_full():
+    queue = CoalescingCommandQueue(maxlen=2)
+    for servo in (1, 2, 3):
+        queue.put(servo, ServoCommand(servo, 0, 0))
+    assert [queue.get(0).servo, queue.get(0).servo] == [2, 3]
+    assert queue.dropped == 1
+
+
+def test_ack_window_does_not_resend_pose_over_newer_servo_command():
+    window = AckWindow(timeout=0)
+    window.register(PoseCommand((10,) * 4, (0,) * 4))
+    window.acknowledge(window.register(ServoCommand(1, 150, 0)))
+    assert window.expired() == []
+    assert len(window) == 0
+
+
+def sample_sequence():
+    sequence = PoseSequence(3)
+    sequence.append([0, 90, 180], [1, 50, 100], 500)
+    sequence.append([45, 46, 47], [0, 0, 0])
+    sequence.append([180, 0, 1], [10, 20, 30], 65534)
+    return sequence
+
+
+def test_records_round_trip():
+    sequence = sample_sequence()
+    restored = PoseSequence.from_records(sequence.to_records(), 3)
+    assert list(restored) == list(sequence)
+    assert list(PoseSequence.from_records(sequence.to_records(1), 3)) == list(sequence)[1:]
+
+
+@pytest.mark.parametrize("poses", [
+    [{"angles": [300, 90], "speeds": [50, 50]}],
+    [{"angles": [90, 90], "speeds": [50, 50], "delay": 65536}],
+    [{"speeds": [50, 50]}],
+    [{"angles": [90, 90], "speeds": [50, 50]}, {"angles": [90], "speeds": [50]}],
+    {"angles": [90, 90], "speeds": [50, 50]},
+    [[90, 90]],
+])
+def test_from_poses_rejects_bad_records(poses):
+    with pytest.raises(ValueError):
+        PoseSequence.from_poses(poses)
+
+
+def test_play_reports_bad_json(tmp_path, capsys):
+    path = tmp_path / "bad.json"
+    path.write_text(json.dumps([{"angles": [90, 90, 90, 256], "speeds": [50] * 4}]))
+    assert main(["play", "-p", "sim://", str(path)]) == 1
+    assert "Ошибка" in capsys.readouterr().err
+
+
+def test_time_stretch_fixes_default_delays():
+    sequence = sample_sequence()
+    sequence.time_stretch(2.0, 500)
+    assert [pose.delay for pose in sequence] == [1000, 1000, 65534]
+    sequence = sample_sequence()
+    sequence.time_stretch(0.5)
+    assert [pose.delay for pose in sequence] == [250, None, 32767]
+
+
+def test_sequence_file_append(tmp_path):
+    sequence = sample_sequence()
+    sequence_file = SequenceFile(str(tmp_path / "commands.rcs"))
+    sequence_file.write(sequence.slice(0, 2))
+    sequence_file.append(sequence, 2)
+    assert len(sequence_file) == 3
+    assert list(SequenceFile(sequence_file.path).read()) == list(sequence)
+    with pytest.raises(ValueError):
+        sequence_file.append(PoseSequence(4))
+
+
+def test_sequence_file_rejects_truncated_header(tmp_path):
+    path = tmp_path / "broken.rcs"
+    path.write_bytes(b"RCS")
+    with pytest.raises(ValueError):
+        SequenceFile(str(path)).read()
+
+
+def test_recorder_replays_ramp_at_recorded_pace():
+    recorder = MotionRecorder(2)
+    for i in range(41):
+        recorder.sample([i * 100 // 40, 90], [50, 50], i * 0.05)
+    poses = list(recorder.to_sequence())
+    assert poses[0].angles == (0, 90) and poses[0].delay == 0
+    assert poses[1].angles == (100, 90)
+    assert poses[1].speeds[0] == 50
+    assert poses[1].delay == 2000
+
+
+@pytest.mark.parametrize("protocol", [PROTOCOL_TEXT, PROTOCOL_BINARY])
+@pytest.mark.parametrize("servo_count", [1, 4, 18])
+def test_simulator_applies_commands(protocol, servo_count):
+    controller = ServoController(servo_count)
+    writer = controller.open(f"sim://?servos={servo_count}", 115200, protocol)
+    try:
+        angles = [(10 * i) % 181 for i in range(servo_count)]
+        controller.send_pose(angles, [0] * servo_count)
+        assert controller.wait_idle(timeout=2)
+        controller.send_servo(servo_count, 33, 0)
+        assert controller.wait_idle(timeout=2)
+        time.sleep(0.05)
+        applied, stats = writer.ser.device_state()
+    finally:
+        controller.close()
+    assert applied == angles[:-1] + [33]
+    assert stats["commands"] == 2
+    assert stats["overruns"] == 0
+
+
+def test_stream_sends_every_line(monkeypatch, capsys):
+    monkeypatch.setattr("sys.stdin", io.StringIO("10 20 30 40\n50 60 70 80\n90 90 90 90\n"))
+    assert main(["stream", "-p", "sim://", "-b", "115200", "--stats"]) == 0
+    summary = json.loads(capsys.readouterr().out)
+    assert summary["written"] == 3
+    assert summary["superseded"] == 0
+
+
+def test_smooth_motion_follows_cartesian_line():
+    arm = ArmModel()
+    start = [90, 90, 90, 90]
+    x, y, z = arm.forward(start)
+    controller = ServoController(4)
+    writer = controller.open("sim://", 115200)
+    try:
+        controller.smooth_motion = True
+        sequence = arm.line_sequence(start, (x + 20, y, z), 50, controller.stream_rate())
+        controller.play(sequence, 0).join(timeout=5)
+        assert controller.wait_idle(timeout=0.5)
+        time.sleep(0.05)
+        applied, _ = writer.ser.device_state()
+    finally:
+        controller.close()
+    assert applied == list(sequence[len(sequence) - 1].angles)
+
+
+def test_stream_rejects_out_of_range_speeds(monkeypatch, capsys):
+    with pytest.raises(ValueError):
+        parse_pose_line("10 20 30 40 255 255 255 255", 4, 50)
+    monkeypatch.setattr("sys.stdin", io.StringIO("10 20 30 40 255 255 255 255\n10 20 30 40 -1 0 0 0\n50 60 70 80\n"))
+    assert main(["stream", "-p", "sim://", "-b", "115200", "--protocol", "binary", "--stats"]) == 1
+    output = capsys.readouterr()
+    assert "Строка 1" in output.err and "Строка 2" in output.err
+    assert json.loads(output.out)["written"] == 1
+
+
+def test_encode_command_keeps_fields_below_frame_markers():
+    with pytest.raises(AssertionError):
+        encode_command(PROTOCOL_BINARY, PoseCommand((10, 20), (255, 50)))
+
+
+def test_cached_firmware_is_only_uploaded(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(FirmwareBuilder, "arduino_cli", lambda self, *args, **kwargs: calls.append(args[0]) or "")
+    builder = FirmwareBuilder("void setup() {}", ["COM3"], cache_dir=str(tmp_path), known_ports=["COM3"])
+    output_dir = tmp_path / builder.cache_key / "build"
+    output_dir.mkdir(parents=True)
+    (output_dir / "RoboCore.ino.hex").write_text(":00000001FF\n")
+    builder.build_and_upload()
+    assert calls == ["upload"]